@@ -36,11 +36,12 @@ This script runs on a small always-on machine (e.g. Raspberry Pi) and performs:
      the original nas_monitor).
 
 4. Continuous Unraid monitoring
-   - Independently from UPS events, the script periodically checks
-     Unraid's array status via SSH:
-       grep -E 'arrayStarted=|mdState=|fsState=' /var/local/emhttp/var.ini
+   - Independently from UPS events, a separate thread periodically checks
+     Unraid's array status via SSH (so a slow SSH call never delays UPS
+     polling). awk on the Unraid host reduces var.ini to one line:
+       started=1|0 mdState=... arrayStarted=... fsState=...
    - It logs whether the array is STARTED or not, and logs the raw
-     status lines whenever there is a change.
+     status whenever there is a change.
 
 Configuration:
     ./nas-monitor.conf  (same directory as this script, by default)
@@ -55,12 +56,21 @@ This file replaces the previous combination of:
 All UPS-related configuration has been moved into nas-monitor.conf.
 """
 
+import array
+import copy
+import errno
 import os
 import time
 import subprocess
 import logging
-from logging.handlers import RotatingFileHandler
-from typing import Dict, Tuple, Any, List, Union, Optional, TYPE_CHECKING
+import math
+import operator
+import queue
+import shlex
+import threading
+from dataclasses import dataclass, field
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Callable, Dict, Tuple, Any, List, Union, Optional, TYPE_CHECKING
 
 import usb.core
 import usb.util
@@ -76,6 +86,18 @@ try:
 except ImportError:
     mqtt = None  # type: ignore[assignment]
 
+# Optional C JSON encoder for MQTT payloads. Both paths return compact
+# UTF-8 bytes, which paho publishes as-is.
+try:
+    import orjson  # type: ignore[import]
+
+    _dumps = orjson.dumps
+except ImportError:
+
+    def _dumps(obj: Any) -> bytes:
+        return json.dumps(obj, separators=(",", ":")).encode()
+
+
 # ---------------------------------------------------------------------------
 # Paths / logger
 # ---------------------------------------------------------------------------
@@ -86,6 +108,18 @@ CONFIG_PATH = "./nas-monitor.conf"
 # Log file path (ensure the running user has permission to write here)
 LOG_PATH = "/home/pi/nas/nas-monitor.log"
 
+# Private (0700) directory holding the OpenSSH ControlMaster socket shared
+# by all SSH calls to the Unraid host; see ssh_control_path()
+SSH_CONTROL_DIR_NAME = "nas-monitor-ssh"
+
+# Exit code ssh uses for its own (connection) errors
+SSH_ERROR_RC = 255
+
+# Upper bound (seconds) for one SSH call, and the exit code reported by
+# run_local_cmd() when a command is killed for taking longer (as timeout(1))
+SSH_TIMEOUT = 30.0
+TIMEOUT_RC = 124
+
 # Global logger instance, configured in setup_logging()
 logger = logging.getLogger("nas-monitor")
 
@@ -95,19 +129,28 @@ logger = logging.getLogger("nas-monitor")
 # ---------------------------------------------------------------------------
 
 
-def setup_logging(log_path: str) -> None:
+def setup_logging(log_path: str) -> Optional[QueueListener]:
     """
     Configure logging for this daemon.
 
     - Primary target: rotating log file (LOG_PATH)
     - Rotation: 1 MB, keep 5 backups
     - Format: "YYYY-MM-DD HH:MM:SS [LEVEL] message"
+    - Records are queued and written by a background QueueListener, so
+      callers never block on disk I/O.
 
     If the log directory cannot be created or the log file cannot be
     opened, we fall back to logging to stderr.
+
+    Returns the started QueueListener (stop it on exit to flush pending
+    records), or None if the stderr fallback is in use or logging was
+    already configured.
     """
     logger.setLevel(logging.INFO)
 
+    if logger.handlers:
+        return None
+
     log_dir = os.path.dirname(log_path)
     if log_dir and not os.path.exists(log_dir):
         try:
@@ -123,7 +166,7 @@ def setup_logging(log_path: str) -> None:
                 log_dir,
                 e,
             )
-            return
+            return None
 
     try:
         handler = RotatingFileHandler(
@@ -142,15 +185,18 @@ def setup_logging(log_path: str) -> None:
             log_path,
             e,
         )
-        return
+        return None
 
     formatter = logging.Formatter(
         "%(asctime)s [%(levelname)s] %(message)s", datefmt="%Y-%m-%d %H:%M:%S"
     )
     handler.setFormatter(formatter)
 
-    if not logger.handlers:
-        logger.addHandler(handler)
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    logger.addHandler(QueueHandler(log_queue))
+    listener = QueueListener(log_queue, handler, respect_handler_level=False)
+    listener.start()
+    return listener
 
 
 # ---------------------------------------------------------------------------
@@ -158,6 +204,47 @@ def setup_logging(log_path: str) -> None:
 # ---------------------------------------------------------------------------
 
 
+# Config keys converted from their raw string form by load_config()
+_INT_KEYS = frozenset(
+    {
+        "power_stable_time",
+        "status_check_interval",
+        "ups_timeout_ms",
+        "ups_timeout_fast_ms",
+        "ups_timeout_retries",
+        "ups_poll_interval",
+        "ups_poll_interval_idle",
+        "ups_poll_interval_battery",
+        "mqtt_port",
+        "mqtt_keepalive",
+        "mqtt_heartbeat_interval",
+        "mqtt_batch_size",
+        "mqtt_batch_max_age",
+        "array_status_max_age",
+        "pin_cpu",
+        "rt_priority",
+    }
+)
+_FLOAT_KEYS = frozenset(
+    {
+        "low_batt_volt",
+        "extra_low_batt_volt",
+        "enable_array_voltage",
+        "mqtt_voltage_deadband",
+    }
+)
+_BOOL_KEYS = frozenset({"silence_beeper", "mqtt_enabled", "mqtt_tls"})
+
+# One config line: optional "key = value", optional trailing "# comment".
+# Group 2 is None for lines without '=' (blank, comment-only or malformed).
+_CFG_LINE_RE = re.compile(
+    r"^[ \t]*([^#=\r\n]*?)[ \t]*(?:=[ \t]*([^#\r\n]*?))?[ \t]*(?:#.*)?\r?$", re.M
+)
+
+# Parsed config per path, keyed on (st_mtime_ns, st_size) of the file
+_CFG_CACHE: Dict[str, Tuple[int, int, Dict[str, Any]]] = {}
+
+
 def _parse_bool(val: str) -> bool:
     """
     Parse a configuration value into boolean.
@@ -207,10 +294,37 @@ def load_config(path: str) -> Dict[str, Any]:
 
         ups_vendor_id (str hex)       : UPS USB vendor ID, e.g. "0001"
         ups_product_id (str hex)      : UPS USB product ID, e.g. "0000"
-        ups_timeout_ms (int)          : control-transfer timeout
-        ups_poll_interval (int)       : seconds between UPS polls
+        ups_timeout_ms (int)          : control-transfer timeout (last try)
+        ups_timeout_fast_ms (int)     : control-transfer timeout (first tries)
+        ups_timeout_retries (int)     : short-timeout tries before the last one
+        ups_poll_interval (int)       : initial delay between UPS discovery
+                                        retries (doubles up to 60s)
+        ups_poll_interval_idle (int)  : seconds between UPS polls on mains
+        ups_poll_interval_battery (int): seconds between UPS polls on battery
 
         silence_beeper (bool)         : whether to attempt to disable UPS beeper
+
+        pin_cpu (int)                 : CPU to pin the control loop to
+                                        (-1 = no pinning)
+        rt_priority (int)             : SCHED_FIFO priority for the control
+                                        loop (0 = normal scheduling)
+
+        mqtt_heartbeat_interval (int) : seconds after which an unchanged
+                                        status is re-published anyway
+        mqtt_voltage_deadband (float) : voltage change (V) needed before a
+                                        UPS sample counts as changed
+        mqtt_batch_size (int)         : samples per <base>/ups/batch message
+                                        (0 disables batch publishing)
+        mqtt_batch_max_age (int)      : seconds before a partial batch is sent
+
+        array_status_source (str)     : "ssh" (poll var.ini) or "mqtt" (use
+                                        var.ini lines pushed by Unraid)
+        mqtt_array_source_topic (str) : topic Unraid pushes var.ini lines to
+        array_status_max_age (int)    : pushed status older than this
+                                        (seconds) falls back to SSH
+
+    The parsed result is cached per path and reused (as a shallow copy)
+    while the file's mtime and size are unchanged.
     """
 
     cfg: Dict[str, Any] = {
@@ -225,95 +339,100 @@ def load_config(path: str) -> Dict[str, Any]:
         "ups_vendor_id": "0001",
         "ups_product_id": "0000",
         "ups_timeout_ms": 5000,
+        "ups_timeout_fast_ms": 500,
+        "ups_timeout_retries": 3,
         "ups_poll_interval": 2,
+        "ups_poll_interval_idle": 10,
+        "ups_poll_interval_battery": 1,
         "silence_beeper": True,
+        "pin_cpu": -1,
+        "rt_priority": 0,
         # MQTT defaults
         "mqtt_enabled": False,
         "mqtt_host": "127.0.0.1",
         "mqtt_port": 1883,
         "mqtt_keepalive": 30,
+        "mqtt_heartbeat_interval": 60,
+        "mqtt_voltage_deadband": 0.1,
+        "mqtt_batch_size": 0,
+        "mqtt_batch_max_age": 15,
         "mqtt_username": "",
         "mqtt_password": "",
         "mqtt_tls": False,
         "mqtt_base_topic": "home/nas",
+        # Array status source
+        "array_status_source": "ssh",
+        "mqtt_array_source_topic": "unraid/array/status",
+        "array_status_max_age": 180,
     }
 
-    if not os.path.exists(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
         logger.error("Config file not found: %s; using defaults where possible", path)
         return cfg
 
-    int_keys = {
-        "power_stable_time",
-        "status_check_interval",
-        "ups_timeout_ms",
-        "ups_poll_interval",
-        "mqtt_port",
-        "mqtt_keepalive",
-    }
-    float_keys = {"low_batt_volt", "extra_low_batt_volt", "enable_array_voltage"}
-    bool_keys = {"silence_beeper", "mqtt_enabled", "mqtt_tls"}
+    # Return the cached parse if the file has not changed since last load.
+    cached = _CFG_CACHE.get(path)
+    if cached is not None and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+        return copy.copy(cached[2])
 
     try:
         with open(path, "r") as f:
-            for raw_line in f:
-                line = raw_line.strip()
-                if not line or line.startswith("#"):
-                    continue
-
-                # Strip inline comments
-                if "#" in line:
-                    line = line.split("#", 1)[0].strip()
-                    if not line:
-                        continue
-
-                if "=" not in line:
+            text = f.read()
+
+        for m in _CFG_LINE_RE.finditer(text):
+            key, val = m.group(1), m.group(2)
+            if val is None:
+                if key:
+                    logger.warning(
+                        "Ignoring malformed config line (no '='): %s",
+                        m.group(0).strip(),
+                    )
+                continue
+
+            val = val.strip('"').strip("'")
+
+            # Integer keys
+            if key in _INT_KEYS:
+                try:
+                    cfg[key] = int(val)
+                except ValueError:
                     logger.warning(
-                        "Ignoring malformed config line (no '='): %s", raw_line.strip()
+                        "Invalid int for %s: %r, using default %r",
+                        key,
+                        val,
+                        cfg[key],
                     )
-                    continue
-
-                key, val = line.split("=", 1)
-                key = key.strip()
-                val = val.strip().strip('"').strip("'")
-
-                # Integer keys
-                if key in int_keys:
-                    try:
-                        cfg[key] = int(val)
-                    except ValueError:
-                        logger.warning(
-                            "Invalid int for %s: %r, using default %r",
-                            key,
-                            val,
-                            cfg[key],
-                        )
-                    continue
-
-                # Float keys
-                if key in float_keys:
-                    try:
-                        cfg[key] = float(val)
-                    except ValueError:
-                        logger.warning(
-                            "Invalid float for %s: %r, using default %r",
-                            key,
-                            val,
-                            cfg[key],
-                        )
-                    continue
-
-                # Boolean keys
-                if key in bool_keys:
-                    cfg[key] = _parse_bool(val)
-                    continue
-
-                # Everything else is treated as a raw string
-                cfg[key] = val
+                continue
+
+            # Float keys
+            if key in _FLOAT_KEYS:
+                try:
+                    cfg[key] = float(val)
+                except ValueError:
+                    logger.warning(
+                        "Invalid float for %s: %r, using default %r",
+                        key,
+                        val,
+                        cfg[key],
+                    )
+                continue
+
+            # Boolean keys
+            if key in _BOOL_KEYS:
+                cfg[key] = _parse_bool(val)
+                continue
+
+            # Everything else is treated as a raw string
+            cfg[key] = val
 
     except Exception as e:
         logger.error("Error reading config file %s: %s", path, e)
+        return cfg
 
-    return cfg
+    _CFG_CACHE[path] = (st.st_mtime_ns, st.st_size, cfg)
+    return copy.copy(cfg)
 
 
 # ---------------------------------------------------------------------------
@@ -321,48 +440,117 @@ def load_config(path: str) -> Dict[str, Any]:
 # ---------------------------------------------------------------------------
 
 
+# Tries for run_local_cmd() when fork fails with EAGAIN/ENOMEM
+_SPAWN_ATTEMPTS = 3
+
+
 def run_local_cmd(
     cmd: Union[List[str], str],
     shell: bool = False,
+    timeout: Optional[float] = SSH_TIMEOUT,
 ) -> Tuple[int, str, str]:
     """
     Run a command locally and return (return_code, stdout, stderr).
 
     Parameters:
-        cmd   : Command to run. If shell=True, this must be a string.
-                If shell=False, this should be a list of arguments.
-        shell : Whether to execute through a shell.
+        cmd     : Command to run. If shell=True, this must be a string.
+                  If shell=False, this should be a list of arguments.
+        shell   : Whether to execute through a shell.
+        timeout : Seconds before the command is killed and
+                  (TIMEOUT_RC, "", "timeout") is returned (None = no limit).
 
     Returns:
         (rc, out, err)
             rc  : Exit code
             out : Captured stdout as text
             err : Captured stderr as text
+
+    Output is captured as bytes and decoded once here (invalid UTF-8 is
+    replaced), so odd bytes from the remote side never turn a successful
+    command into a failure.
+
+    If the child cannot be spawned because of a transient resource
+    shortage (EAGAIN/ENOMEM from fork), the spawn is retried a few times
+    with a short backoff.
+    """
+    attempt = 1
+    delay = 0.5
+    while True:
+        try:
+            result = subprocess.run(
+                cmd,  # type: ignore[arg-type]
+                shell=shell,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                timeout=timeout,
+            )
+            return (
+                result.returncode,
+                result.stdout.decode("utf-8", errors="replace"),
+                result.stderr.decode("utf-8", errors="replace"),
+            )
+        except subprocess.TimeoutExpired:
+            logger.warning("Command timed out after %ss; killed.", timeout)
+            return TIMEOUT_RC, "", "timeout"
+        except OSError as e:
+            if e.errno in (errno.EAGAIN, errno.ENOMEM) and attempt < _SPAWN_ATTEMPTS:
+                logger.warning("Could not spawn command (%s); retrying", e)
+                time.sleep(delay)
+                attempt += 1
+                delay *= 2
+                continue
+            return 1, "", str(e)
+        except Exception as e:
+            # On failure, emulate a non-zero exit code with error text
+            return 1, "", str(e)
+
+
+def ssh_control_path() -> Optional[str]:
     """
+    Return the ControlPath for the SSH master socket, creating its parent
+    directory with mode 0700 under $XDG_RUNTIME_DIR (or ~/.ssh when that
+    is not set). A private directory keeps other local users from
+    pre-creating or hijacking the socket, as they could in /tmp.
+
+    Returns None (multiplexing disabled) if the directory cannot be
+    created.
+    """
+    base = os.environ.get("XDG_RUNTIME_DIR") or os.path.expanduser("~/.ssh")
+    control_dir = os.path.join(base, SSH_CONTROL_DIR_NAME)
+
     try:
-        result = subprocess.run(
-            cmd,  # type: ignore[arg-type]
-            shell=shell,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
+        os.makedirs(control_dir, mode=0o700, exist_ok=True)
+        os.chmod(control_dir, 0o700)
+    except OSError as e:
+        logger.warning(
+            "Could not create SSH control directory %s: %s; "
+            "SSH connection sharing disabled",
+            control_dir,
+            e,
         )
-        return result.returncode, result.stdout, result.stderr
-    except Exception as e:
-        # On failure, emulate a non-zero exit code with error text
-        return 1, "", str(e)
+        return None
 
+    # %C is a short hash of local host, remote host, port and user, which
+    # keeps the socket path under the AF_UNIX length limit.
+    return os.path.join(control_dir, "%C")
 
-def build_ssh_command(cfg: Dict[str, Any], remote_cmd: str) -> List[str]:
+
+def build_ssh_prefix(cfg: Dict[str, Any]) -> List[str]:
     """
-    Build an SSH command list to execute `remote_cmd` on the Unraid host.
+    Build the SSH command list (options + user@host) shared by every
+    remote call. run() builds it once and stores it as cfg["_ssh_prefix"].
 
     Notes:
         - Only key-based SSH authentication is supported.
         - Any configured `pwd` is ignored (but a warning is logged if present).
+        - Connection multiplexing (ControlMaster) is enabled: the first call
+          opens a master connection at ssh_control_path(), later calls reuse
+          it and skip the TCP + SSH handshake. The master stays up for 10
+          minutes after the last use.
 
     Returns:
-        List[str] representing the SSH command and its arguments.
+        List[str] representing the SSH command up to (not including) the
+        remote command.
     """
     host = cfg.get("host")
     user = cfg.get("user")
@@ -387,43 +575,126 @@ def build_ssh_command(cfg: Dict[str, Any], remote_cmd: str) -> List[str]:
         "ConnectTimeout=10",
     ]
 
+    control_path = ssh_control_path()
+    if control_path:
+        ssh_cmd += [
+            "-o",
+            "ControlMaster=auto",
+            "-o",
+            f"ControlPath={control_path}",
+            "-o",
+            "ControlPersist=600",
+        ]
+
     if user:
         target = f"{user}@{host}"
     else:
         target = str(host)
 
     ssh_cmd.append(target)
-    ssh_cmd.append(remote_cmd)
     return ssh_cmd
 
 
-def run_ssh_command(cfg: Dict[str, Any], remote_cmd: str) -> Tuple[int, str, str]:
+def build_ssh_command(cfg: Dict[str, Any], remote_cmd: str) -> List[str]:
+    """
+    Build an SSH command list to execute `remote_cmd` on the Unraid host,
+    using the cached cfg["_ssh_prefix"] when present.
+
+    Returns:
+        List[str] representing the SSH command and its arguments.
+    """
+    prefix = cfg.get("_ssh_prefix") or build_ssh_prefix(cfg)
+    return prefix + [remote_cmd]
+
+
+# Recently logged SSH stderr texts -> monotonic time of their last warning.
+# The same text is only warned about again after SSH_STDERR_REPEAT seconds.
+_ssh_stderr_seen: Dict[str, float] = {}
+_ssh_stderr_lock = threading.Lock()
+SSH_STDERR_REPEAT = 60.0
+SSH_STDERR_KEEP = 3
+
+
+def _log_ssh_stderr(err: str) -> None:
+    """
+    Log SSH stderr as a warning, but only DEBUG-log a text that was already
+    warned about in the last SSH_STDERR_REPEAT seconds, so a persistent
+    benign message does not flood the log.
+    """
+    now = time.monotonic()
+    with _ssh_stderr_lock:
+        last = _ssh_stderr_seen.pop(err, None)
+        repeat = last is not None and now - last < SSH_STDERR_REPEAT
+        _ssh_stderr_seen[err] = last if repeat else now
+        while len(_ssh_stderr_seen) > SSH_STDERR_KEEP:
+            del _ssh_stderr_seen[next(iter(_ssh_stderr_seen))]
+
+    if repeat:
+        logger.debug("SSH STDERR (repeated):\n%s", err)
+    else:
+        logger.warning("SSH STDERR:\n%s", err)
+
+
+def run_ssh_command(
+    cfg: Dict[str, Any], remote_cmd: str, timeout: float = SSH_TIMEOUT
+) -> Tuple[int, str, str]:
     """
     Execute a remote command on the Unraid host via SSH.
 
+    The ssh client is killed if it runs longer than `timeout` seconds, so
+    a stalled network or wedged sshd cannot hang the caller (rc is then
+    TIMEOUT_RC).
+
     Logs:
-        - The SSH command string (for diagnostics)
-        - STDOUT (if non-empty)
-        - STDERR (if non-empty)
-        - Exit code
+        - The SSH command string, STDOUT and exit code (DEBUG only;
+          STDOUT is a warning if the command failed)
+        - STDERR as a warning (repeats within a minute at DEBUG only)
+
+    If ssh itself fails (exit code 255: connection refused/reset, stale
+    ControlMaster socket, ...), the command is retried once so a dropped
+    master connection is re-established transparently.
 
     Returns:
         (rc, out, err) from subprocess.
     """
     ssh_cmd = build_ssh_command(cfg, remote_cmd)
-    logger.info("SSH EXEC: %s", " ".join(ssh_cmd))
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("SSH EXEC: %s", shlex.join(ssh_cmd))
 
-    rc, out, err = run_local_cmd(ssh_cmd)
+    rc, out, err = run_local_cmd(ssh_cmd, timeout=timeout)
+    if rc == SSH_ERROR_RC:
+        logger.warning("SSH connection failed (%s); retrying once", err.strip())
+        rc, out, err = run_local_cmd(ssh_cmd, timeout=timeout)
 
     if out.strip():
-        logger.info("SSH STDOUT:\n%s", out.strip())
+        if rc != 0:
+            logger.warning("SSH STDOUT (rc=%d):\n%s", rc, out.strip())
+        else:
+            logger.debug("SSH STDOUT:\n%s", out.strip())
     if err.strip():
-        logger.warning("SSH STDERR:\n%s", err.strip())
+        _log_ssh_stderr(err.strip())
 
-    logger.info("SSH EXIT CODE: %d", rc)
+    logger.debug("SSH EXIT CODE: %d", rc)
     return rc, out, err
 
 
+def close_ssh_master(cfg: Dict[str, Any]) -> None:
+    """
+    Ask the ControlMaster connection (see build_ssh_prefix()) to exit, so
+    it does not linger for ControlPersist after the monitor stops. Does
+    nothing harmful if no master is running.
+    """
+    prefix = cfg.get("_ssh_prefix")
+    if not prefix:
+        return
+
+    rc, _, err = run_local_cmd(prefix[:-1] + ["-O", "exit", prefix[-1]])
+    if rc == 0:
+        logger.info("Closed SSH master connection.")
+    else:
+        logger.debug("No SSH master connection to close: %s", err.strip())
+
+
 # ---------------------------------------------------------------------------
 # MQTT publishing helpers
 # ---------------------------------------------------------------------------
@@ -442,6 +713,8 @@ def setup_mqtt(cfg: Dict[str, Any]) -> Optional["mqtt.Client"]:
             * Creates a client
             * Applies optional username/password auth
             * Optionally enables basic TLS
+            * Subscribes to mqtt_array_source_topic when
+              array_status_source=mqtt (re-subscribed on every connect)
             * Connects to the broker
             * Starts the network loop (loop_start) in a background thread
 
@@ -466,6 +739,11 @@ def setup_mqtt(cfg: Dict[str, Any]) -> Optional["mqtt.Client"]:
     password = str(cfg.get("mqtt_password") or "") or None
     use_tls = bool(cfg.get("mqtt_tls", False))
 
+    # Topics are fixed for the life of the process; build them once.
+    cfg["_topic_ups"] = _mqtt_topic(cfg, "ups")
+    cfg["_topic_ups_batch"] = _mqtt_topic(cfg, "ups/batch")
+    cfg["_topic_array"] = _mqtt_topic(cfg, "array")
+
     client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)  # type: ignore[call-arg]
 
     # Optional authentication
@@ -477,6 +755,19 @@ def setup_mqtt(cfg: Dict[str, Any]) -> Optional["mqtt.Client"]:
         logger.info("Enabling TLS for MQTT connection.")
         client.tls_set()
 
+    # Optional array status pushed by Unraid instead of polled over SSH
+    if str(cfg.get("array_status_source", "ssh")).lower() == "mqtt":
+        source_topic = str(cfg.get("mqtt_array_source_topic"))
+        logger.info("Array status source: MQTT topic '%s'.", source_topic)
+
+        def on_connect(
+            client: Any, userdata: Any, flags: Any, reason_code: Any, props: Any
+        ) -> None:
+            client.subscribe(source_topic, qos=0)
+
+        client.on_connect = on_connect
+        client.message_callback_add(source_topic, on_array_message)
+
     logger.info(
         "Connecting to MQTT broker %s:%d (keepalive=%d, tls=%s)...",
         host,
@@ -498,6 +789,54 @@ def setup_mqtt(cfg: Dict[str, Any]) -> Optional["mqtt.Client"]:
     return client
 
 
+# Latest var.ini status text pushed by Unraid over MQTT and its monotonic
+# arrival time. Replaced as a whole tuple by the paho thread, so readers
+# never see a half-written value.
+_mqtt_array_push: Optional[Tuple[str, float]] = None
+
+
+def on_array_message(client: Any, userdata: Any, msg: Any) -> None:
+    """
+    paho callback for mqtt_array_source_topic. The payload is the
+    var.ini status lines, e.g.:
+        mdState=STARTED
+        arrayStarted="yes"
+        fsState=Started
+    """
+    global _mqtt_array_push
+    raw = msg.payload.decode("utf-8", errors="replace").strip()
+    _mqtt_array_push = (raw, time.monotonic())
+
+
+# Last published change key + monotonic publish time, per topic suffix
+_mqtt_last_publish: Dict[str, Tuple[Any, float]] = {}
+
+# Serializes publishes from the main loop and the array poll thread
+_mqtt_lock = threading.Lock()
+
+
+def _mqtt_publish_due(
+    cfg: Dict[str, Any],
+    suffix: str,
+    key: Any,
+    unchanged: Callable[[Any, Any], bool] = operator.eq,
+) -> bool:
+    """
+    Return True if a status with change key `key` should be published to
+    <mqtt_base_topic>/<suffix>: either the key differs from the last
+    published one (as judged by `unchanged(last_key, key)`), or
+    mqtt_heartbeat_interval seconds have passed.
+    """
+    now = time.monotonic()
+    heartbeat = int(cfg.get("mqtt_heartbeat_interval", 60))
+    with _mqtt_lock:
+        last = _mqtt_last_publish.get(suffix)
+        if last is not None and unchanged(last[0], key) and now - last[1] < heartbeat:
+            return False
+        _mqtt_last_publish[suffix] = (key, now)
+    return True
+
+
 def _mqtt_topic(cfg: Dict[str, Any], suffix: str) -> str:
     """
     Build a concrete MQTT topic by appending a suffix to the configured
@@ -512,56 +851,128 @@ def _mqtt_topic(cfg: Dict[str, Any], suffix: str) -> str:
     return f"{base}/{suffix}"
 
 
+def _ups_payload(status: "UpsStatus") -> Dict[str, Any]:
+    """
+    Build the JSON-ready dict for one UPS sample: "time" plus
+    UpsStatus.to_dict() with floats rounded to 0.1.
+    """
+    payload: Dict[str, Any] = {"time": int(time.time())}
+    payload.update(status.to_dict())
+    for name in UpsStatus.FLOAT_FIELDS:
+        payload[name] = round(payload[name], 1)
+    return payload
+
+
 def publish_ups_status(
     cfg: Dict[str, Any],
-    client: Optional["mqtt.Client"],
-    status: Dict[str, Any],
+    client: "mqtt.Client",
+    status: "UpsStatus",
+    qos: int = 0,
+    retain: bool = False,
 ) -> None:
     """
     Publish a single UPS status sample to MQTT.
 
+    Periodic samples use QoS 0 (fire and forget); main_control_loop()
+    passes qos=1, retain=True for the sample at a mains/battery
+    transition. Either way publish() only queues the message for paho's
+    network thread (loop_start()), so it never waits on the broker.
+
+    Samples are debounced: nothing is sent unless on_battery, battery_low
+    or load changed, battery/input voltage moved by at least
+    mqtt_voltage_deadband since the last publish, or the heartbeat
+    interval (mqtt_heartbeat_interval) has passed.
+
     Topic:
         <mqtt_base_topic>/ups
 
-    Payload (JSON object), for example:
+    Payload (JSON object): "time" plus UpsStatus.to_dict() with floats
+    rounded to 0.1, for example:
         {
           "time": 1710001234,
           "input_voltage": 230.1,
+          "input_fault_voltage": 230.1,
           "output_voltage": 228.5,
           "load_percent": 23,
+          "input_frequency": 50.0,
           "battery_voltage": 25.1,
           "temperature_c": 28.0,
+          "flags_raw": "01000011",
           "on_battery": false,
-          "battery_low": false,
-          "flags_raw": "01000011"
+          "battery_low": true,
+          ...remaining flag booleans...
         }
+
+    Callers skip this entirely when MQTT is disabled (no client).
     """
-    if client is None:
+    payload = _ups_payload(status)
+
+    key = (
+        status.on_battery,
+        status.battery_low,
+        status.load_percent,
+        status.battery_voltage,
+        status.input_voltage,
+    )
+    deadband = float(cfg.get("mqtt_voltage_deadband", 0.1))
+
+    def unchanged(last: Tuple[Any, ...], new: Tuple[Any, ...]) -> bool:
+        # Compared against the last *published* voltages, so slow drift
+        # still gets through once it adds up to the deadband. Rounding
+        # keeps float noise (0.3 - 0.2 < 0.1) from hiding a 0.1V step.
+        return (
+            last[:3] == new[:3]
+            and round(abs(last[3] - new[3]), 3) < deadband
+            and round(abs(last[4] - new[4]), 3) < deadband
+        )
+
+    if not _mqtt_publish_due(cfg, "ups", key, unchanged):
         return
 
-    topic = _mqtt_topic(cfg, "ups")
-    payload = {
-        "time": int(time.time()),
-        "input_voltage": status.get("input_voltage"),
-        "output_voltage": status.get("output_voltage"),
-        "load_percent": status.get("load_percent"),
-        "battery_voltage": status.get("battery_voltage"),
-        "temperature_c": status.get("temperature_c"),
-        "on_battery": bool(status.get("on_battery")),
-        "battery_low": bool(status.get("battery_low")),
-        "flags_raw": status.get("flags_raw"),
-    }
+    topic = cfg["_topic_ups"]
 
     try:
-        client.publish(topic, json.dumps(payload), qos=0, retain=False)
+        with _mqtt_lock:
+            client.publish(topic, _dumps(payload), qos=qos, retain=retain)
         logger.info("Published UPS status to MQTT topic '%s'.", topic)
     except Exception as e:
         logger.warning("Failed to publish UPS status to MQTT: %s", e)
 
 
+def publish_ups_batch(
+    cfg: Dict[str, Any],
+    client: "mqtt.Client",
+    batch: List[Dict[str, Any]],
+) -> None:
+    """
+    Publish buffered UPS samples (see _ups_payload()) as one JSON array and
+    empty the buffer.
+
+    Unlike publish_ups_status(), every sample is kept (no debouncing), so
+    subscribers get the full poll history at one message per batch.
+
+    Topic:
+        <mqtt_base_topic>/ups/batch
+    """
+    if not batch:
+        return
+
+    topic = cfg["_topic_ups_batch"]
+    count = len(batch)
+
+    try:
+        with _mqtt_lock:
+            client.publish(topic, _dumps(batch), qos=0, retain=False)
+        logger.info("Published %d UPS samples to MQTT topic '%s'.", count, topic)
+    except Exception as e:
+        logger.warning("Failed to publish UPS batch to MQTT: %s", e)
+    finally:
+        batch.clear()
+
+
 def publish_array_status(
     cfg: Dict[str, Any],
-    client: Optional["mqtt.Client"],
+    client: "mqtt.Client",
     started: bool,
     raw_status: str,
 ) -> None:
@@ -575,16 +986,21 @@ def publish_array_status(
         {
           "time": 1710001234,
           "started": true,
-          "raw_status": "mdState=STARTED\narrayStarted=\"yes\"..."
+          "raw_status": "started=1 mdState=STARTED arrayStarted=\"yes\" ..."
         }
 
-    The 'raw_status' field is the combined lines from var.ini that were
-    already obtained by get_array_status().
+    The 'raw_status' field is the var.ini status already obtained by
+    get_array_status() (the summary line, or the pushed var.ini lines).
+
+    Like publish_ups_status(), unchanged (started, raw_status) pairs are
+    only re-sent every mqtt_heartbeat_interval seconds.
+
+    Callers skip this entirely when MQTT is disabled (no client).
     """
-    if client is None:
+    if not _mqtt_publish_due(cfg, "array", (bool(started), raw_status)):
         return
 
-    topic = _mqtt_topic(cfg, "array")
+    topic = cfg["_topic_array"]
     payload = {
         "time": int(time.time()),
         "started": bool(started),
@@ -592,7 +1008,8 @@ def publish_array_status(
     }
 
     try:
-        client.publish(topic, json.dumps(payload), qos=0, retain=False)
+        with _mqtt_lock:
+            client.publish(topic, _dumps(payload), qos=0, retain=False)
         logger.info("Published array status to MQTT topic '%s'.", topic)
     except Exception as e:
         logger.warning("Failed to publish array status to MQTT: %s", e)
@@ -603,175 +1020,325 @@ def publish_array_status(
 # ---------------------------------------------------------------------------
 
 
+# Array actions understood by run_remote_batch(): name -> (log label,
+# update.htm POST body). ${CSRF} is set once by the batch script.
+ARRAY_ACTIONS: Dict[str, Tuple[str, str]] = {
+    "start": (
+        "START ARRAY",
+        "startState=STOPPED&file=&csrf_token=${CSRF}&cmdStart=Start",
+    ),
+    "stop": (
+        "STOP ARRAY",
+        "startState=STARTED&file=&csrf_token=${CSRF}&cmdStop=Stop",
+    ),
+    "shutdown": (
+        "SHUTDOWN",
+        "csrf_token=${CSRF}&cmdShutdown=Shutdown",
+    ),
+}
+
+# Remote snippets shared by the batch script
+_CSRF_CMD = "CSRF=$(grep -Po '^csrf_token=\"\\K[^\"]+' /var/local/emhttp/var.ini)"
+# Summarise var.ini on the Unraid host as one line:
+#   started=1|0 mdState=... arrayStarted=... fsState=...
+_STATUS_CMD = (
+    "awk -F= '/^arrayStarted=/{a=$2} /^mdState=/{m=$2} /^fsState=/{f=$2} "
+    'END{printf "started=%d mdState=%s arrayStarted=%s fsState=%s\\n", '
+    "(a ~ /yes/ || m ~ /STARTED/), m, a, f}' /var/local/emhttp/var.ini "
+    "2>/dev/null || true"
+)
+
+# Succeeds on the Unraid host if the array is already started; a "start"
+# action is skipped remotely in that case (the slot value may be stale)
+_STARTED_CHECK_CMD = "grep -Eq '^mdState=\"?STARTED' /var/local/emhttp/var.ini"
+
+# Markers that split run_remote_batch() stdout into sections
+_BATCH_RC_MARKER = "__NAS_MONITOR_RC__"
+_BATCH_STATUS_MARKER = "__NAS_MONITOR_STATUS__"
+_BATCH_SKIPPED = "skip"
+
+
 def _build_update_cmd(data_expr: str) -> str:
     """
-    Build the shell one-liner that:
-        - Extracts csrf_token from /var/local/emhttp/var.ini
+    Build the shell snippet that:
+        - Sets DATA to the POST body once
         - Issues a POST to /update.htm via curl (HTTP)
         - If HTTP fails, retries via HTTPS
 
     The caller must provide `data_expr`, which typically includes
     a reference to ${CSRF}, for example:
         "startState=STOPPED&file=&csrf_token=${CSRF}&cmdStart=Start"
+
+    ${CSRF} must already be set (see _CSRF_CMD).
     """
     cmd = (
-        "CSRF=$(grep -Po '^csrf_token=\"\\K[^\"]+' /var/local/emhttp/var.ini);"
+        f'DATA="{data_expr}"; '
         'curl -sS -k --fail -e "http://localhost/Main" '
         "-c /tmp/unraid.cookies -b /tmp/unraid.cookies "
-        f'--data "{data_expr}" '
+        '--data "$DATA" '
         "http://localhost/update.htm || "
         'curl -sS -k --fail -e "https://localhost/Main" '
         "-c /tmp/unraid.cookies -b /tmp/unraid.cookies "
-        f'--data "{data_expr}" '
+        '--data "$DATA" '
         "https://localhost/update.htm"
     )
     return cmd
 
 
-def start_array_via_update(cfg: Dict[str, Any]) -> bool:
+# update.htm POST snippets, built once at import (see ARRAY_ACTIONS)
+UPDATE_CMD_START = _build_update_cmd(ARRAY_ACTIONS["start"][1])
+UPDATE_CMD_STOP = _build_update_cmd(ARRAY_ACTIONS["stop"][1])
+UPDATE_CMD_SHUTDOWN = _build_update_cmd(ARRAY_ACTIONS["shutdown"][1])
+
+_UPDATE_CMDS: Dict[str, str] = {
+    "start": UPDATE_CMD_START,
+    "stop": UPDATE_CMD_STOP,
+    "shutdown": UPDATE_CMD_SHUTDOWN,
+}
+
+
+def run_remote_batch(
+    cfg: Dict[str, Any], actions: List[str], with_status: bool = True
+) -> Dict[str, Any]:
     """
-    Request that Unraid START the array via /update.htm.
+    Run the given array actions and (optionally) read the array status in
+    a single SSH round trip.
 
-    This mirrors the behavior of the Unraid web UI for starting the array
-    and is compatible with Unraid 7.x (and similar versions).
+    The remote script reads csrf_token once, POSTs each action to
+    /update.htm in order (see ARRAY_ACTIONS), echoes a marker line with
+    each action's exit code, then prints a one-line var.ini status
+    summary (see _STATUS_CMD). A "start" is only POSTed if var.ini does
+    not already show the array as STARTED; otherwise its marker says
+    "skip".
 
-    It constructs a POST with:
-        startState=STOPPED
-        file=
-        csrf_token=<token>
-        cmdStart=Start
+    Returns a dictionary with:
+        results    : {action: bool} – True if the POST succeeded (or a
+                     start was skipped because the array is started)
+        started    : array started flag (None if with_status is False)
+        raw_status : status summary for logging / MQTT
     """
-    data_expr = "startState=STOPPED&file=&csrf_token=${CSRF}&cmdStart=Start"
-    remote_cmd = _build_update_cmd(data_expr)
+    parts: List[str] = []
+    if actions:
+        parts.append(_CSRF_CMD)
+    for action in actions:
+        label = ARRAY_ACTIONS[action][0]
+        logger.info("Sending %s request via update.htm (curl + csrf_token)", label)
+        post = (
+            f"{_UPDATE_CMDS[action]}; printf '\\n{_BATCH_RC_MARKER} {action} %d\\n' $?"
+        )
+        if action == "start":
+            post = (
+                f"if {_STARTED_CHECK_CMD}; then "
+                f"printf '\\n{_BATCH_RC_MARKER} {action} {_BATCH_SKIPPED}\\n'; "
+                f"else {post}; fi"
+            )
+        parts.append(post)
+    if with_status:
+        parts.append(f"echo {_BATCH_STATUS_MARKER}")
+        parts.append(_STATUS_CMD)
 
-    logger.info("Sending START ARRAY request via update.htm (curl + csrf_token)")
-    rc, out, err = run_ssh_command(cfg, remote_cmd)
+    # A plain status read must finish before the next poll is due
+    timeout = SSH_TIMEOUT
+    if not actions:
+        timeout = min(float(cfg.get("status_check_interval", 10)), SSH_TIMEOUT)
 
-    if rc == 0:
-        logger.info("Start array request sent successfully via update.htm.")
-        return True
+    rc, out, err = run_ssh_command(cfg, "; ".join(parts), timeout)
+    if rc != 0:
+        logger.warning("Remote batch failed (rc=%d): %s", rc, err.strip())
 
-    logger.error(
-        "Start array request FAILED (rc=%d). stdout:\n%s\nstderr:\n%s",
-        rc,
-        out.strip(),
-        err.strip(),
-    )
-    return False
+    results: Dict[str, bool] = {action: False for action in actions}
+    action_out: List[str] = []
+    status_lines: Optional[List[str]] = None
 
+    for line in out.splitlines():
+        if status_lines is not None:
+            status_lines.append(line)
+        elif line.startswith(_BATCH_RC_MARKER):
+            fields = line.split()
+            if len(fields) != 3 or fields[1] not in results:
+                # Cut short or interleaved output: whichever action it was
+                # for is left as failed (results default to False)
+                logger.error("Malformed batch marker line: %r", line)
+                action_out = []
+                continue
+            _, action, action_rc = fields
+            label = ARRAY_ACTIONS[action][0]
+            if action_rc == "0":
+                logger.info("%s request sent successfully via update.htm.", label)
+                results[action] = True
+            elif action_rc == _BATCH_SKIPPED:
+                logger.info("%s request skipped: array already STARTED.", label)
+                results[action] = True
+            else:
+                logger.error(
+                    "%s request FAILED (rc=%s). output:\n%s",
+                    label,
+                    action_rc,
+                    "\n".join(action_out).strip(),
+                )
+            action_out = []
+        elif line == _BATCH_STATUS_MARKER:
+            status_lines = []
+        else:
+            action_out.append(line)
 
-def stop_array_via_update(cfg: Dict[str, Any]) -> bool:
-    """
-    Request that Unraid STOP the array via /update.htm.
+    started: Optional[bool] = None
+    raw_status = ""
+    if with_status:
+        status_out = "\n".join(status_lines or [])
+        started = _parse_status_summary(status_out)
+        # stderr was already logged by run_ssh_command(); keeping it out of
+        # raw_status also keeps ssh warnings from looking like a change
+        raw_status = status_out.strip()
 
-    Per your instructions, this uses:
-        startState=STARTED
-        file=
-        csrf_token=<token>
-        cmdStop=Stop
-    """
-    data_expr = "startState=STARTED&file=&csrf_token=${CSRF}&cmdStop=Stop"
-    remote_cmd = _build_update_cmd(data_expr)
+    return {"results": results, "started": started, "raw_status": raw_status}
 
-    logger.info("Sending STOP ARRAY request via update.htm (curl + csrf_token)")
-    rc, out, err = run_ssh_command(cfg, remote_cmd)
 
-    if rc == 0:
-        logger.info("Stop array request sent successfully via update.htm.")
-        return True
+# ---------------------------------------------------------------------------
+# Unraid array status
+# ---------------------------------------------------------------------------
 
-    logger.error(
-        "Stop array request FAILED (rc=%d). stdout:\n%s\nstderr:\n%s",
-        rc,
-        out.strip(),
-        err.strip(),
-    )
-    return False
 
+# var.ini fields used to decide whether the array is started
+STATUS_RE = re.compile(r"^(mdState|arrayStarted|fsState)=(.*)$", re.M)
 
-def shutdown_nas_via_update(cfg: Dict[str, Any]) -> bool:
-    """
-    Request that Unraid SHUT DOWN the system via /update.htm.
 
-    Per your instructions, this uses:
-        csrf_token=<token>
-        cmdShutdown=Shutdown
+def _parse_array_status(out: str) -> bool:
+    """
+    Decide from var.ini status lines whether the array is STARTED
+    (based on mdState/arrayStarted fields). Logs a warning if not.
     """
-    data_expr = "csrf_token=${CSRF}&cmdShutdown=Shutdown"
-    remote_cmd = _build_update_cmd(data_expr)
+    fields = dict(STATUS_RE.findall(out))
+    md_state = fields.get("mdState", "")
+    array_started = fields.get("arrayStarted", "")
+    started = "STARTED" in md_state or '"yes"' in array_started
 
-    logger.info("Sending SHUTDOWN request via update.htm (curl + csrf_token)")
-    rc, out, err = run_ssh_command(cfg, remote_cmd)
+    if not started:
+        _warn_not_started(fields)
 
-    if rc == 0:
-        logger.info("Shutdown request sent successfully via update.htm.")
-        return True
+    return started
 
-    logger.error(
-        "Shutdown request FAILED (rc=%d). stdout:\n%s\nstderr:\n%s",
-        rc,
-        out.strip(),
-        err.strip(),
-    )
-    return False
 
+def _parse_status_summary(out: str) -> bool:
+    """
+    Decide from the one-line summary printed by _STATUS_CMD
+    ("started=1 mdState=... arrayStarted=... fsState=...") whether the
+    array is STARTED. Logs a warning if not.
+    """
+    fields = dict(kv.split("=", 1) for kv in out.split() if "=" in kv)
+    started = fields.get("started") == "1"
 
-# ---------------------------------------------------------------------------
-# Unraid array status
-# ---------------------------------------------------------------------------
+    if not started:
+        _warn_not_started(fields)
+
+    return started
+
+
+def _warn_not_started(fields: Dict[str, str]) -> None:
+    logger.warning(
+        "Array not started. mdState=%s, arrayStarted=%s, fsState=%s",
+        fields.get("mdState"),
+        fields.get("arrayStarted"),
+        fields.get("fsState"),
+    )
 
 
 def get_array_status(cfg: Dict[str, Any]) -> Tuple[bool, str]:
     """
     Query Unraid for array status via /var/local/emhttp/var.ini.
 
-    The remote command executed is:
-        grep -E 'arrayStarted=|mdState=|fsState=' /var/local/emhttp/var.ini
+    With array_status_source=mqtt, the latest status pushed by Unraid
+    (see on_array_message()) is used while it is younger than
+    array_status_max_age. Otherwise, or if nothing fresh has arrived,
+    the status is read over SSH, summarised by awk on the Unraid host
+    (see _STATUS_CMD).
 
     Returns:
         (started_bool, raw_output)
             started_bool : True if array appears to be STARTED
                            (based on mdState/arrayStarted fields)
-            raw_output   : Combined stdout+stderr for logging / diagnostics
+            raw_output   : Status text for logging / diagnostics
     """
-    remote_cmd = (
-        "grep -E 'arrayStarted=|mdState=|fsState=' /var/local/emhttp/var.ini "
-        "2>/dev/null || true"
-    )
+    if str(cfg.get("array_status_source", "ssh")).lower() == "mqtt":
+        push = _mqtt_array_push
+        max_age = int(cfg.get("array_status_max_age", 180))
+        if push is not None and time.monotonic() - push[1] < max_age:
+            return _parse_array_status(push[0]), push[0]
+        logger.warning("No fresh array status over MQTT; falling back to SSH.")
 
-    rc, out, err = run_ssh_command(cfg, remote_cmd)
-    if rc != 0:
-        logger.warning("Failed to get array status (rc=%d): %s", rc, err.strip())
+    batch = run_remote_batch(cfg, [])
+    return bool(batch["started"]), batch["raw_status"]
 
-    started = False
-    md_state = None
-    array_started = None
-    fs_state = None
 
-    for line in out.splitlines():
-        line = line.strip()
-        if line.startswith("mdState="):
-            md_state = line
-            if "STARTED" in line:
-                started = True
-        elif line.startswith("arrayStarted="):
-            array_started = line
-            if '"yes"' in line:
-                started = True
-        elif line.startswith("fsState="):
-            fs_state = line
+@dataclass
+class ArrayStatusSlot:
+    """
+    Latest Unraid array status, shared between the array poll thread and
+    main_control_loop(). All access goes through get()/set().
+    """
 
-    if not started:
-        logger.warning(
-            "Array not started. mdState=%s, arrayStarted=%s, fsState=%s",
-            md_state,
-            array_started,
-            fs_state,
-        )
+    started: Optional[bool] = None
+    raw: str = ""
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def set(self, started: bool, raw: str) -> None:
+        with self.lock:
+            self.started = started
+            self.raw = raw
+
+    def get(self) -> Tuple[Optional[bool], str]:
+        with self.lock:
+            return self.started, self.raw
+
+
+def report_array_status(
+    cfg: Dict[str, Any],
+    mqtt_client: Optional["mqtt.Client"],
+    slot: ArrayStatusSlot,
+    started: bool,
+    raw: str,
+) -> None:
+    """
+    Log a fresh array status, store it in `slot` and publish it to MQTT.
+    An unchanged status is only logged at DEBUG.
+    """
+    if slot.get() == (started, raw):
+        logger.debug("Periodic check: Unraid array status unchanged.")
+    else:
+        if started:
+            logger.info("Periodic check: Unraid array is STARTED.")
+        else:
+            logger.warning("Periodic check: Unraid array is NOT started.")
+
+        if raw:
+            logger.info("Unraid raw status output:\n%s", raw)
+
+    slot.set(started, raw)
+
+    # Publish current array state to MQTT (if enabled).
+    if mqtt_client is not None:
+        publish_array_status(cfg, mqtt_client, started, raw)
 
-    # Combine stdout+stderr text for optional logging by caller
-    raw = out + (("\n" + err) if err else "")
-    return started, raw.strip()
+
+def array_poll_loop(
+    cfg: Dict[str, Any],
+    mqtt_client: Optional["mqtt.Client"],
+    slot: ArrayStatusSlot,
+    stop_event: threading.Event,
+) -> None:
+    """
+    Thread body: poll Unraid array status every `status_check_interval`
+    seconds until `stop_event` is set.
+    """
+    status_check_interval = int(cfg.get("status_check_interval", 10))
+
+    while not stop_event.is_set():
+        try:
+            started, raw = get_array_status(cfg)
+            report_array_status(cfg, mqtt_client, slot, started, raw)
+        except Exception as e:
+            logger.exception("Array status poll failed: %s", e)
+        stop_event.wait(status_check_interval)
 
 
 # ---------------------------------------------------------------------------
@@ -786,52 +1353,189 @@ def clean_num(token: str) -> float:
     """
     Strip any non-numeric noise from a token and convert to float.
 
+    Tokens are normally already clean, so a plain float() is tried first
+    and NUM_RE is only used when that fails.
+
     Raises:
         ValueError if cleaning results in an empty or trivial string.
     """
+    try:
+        value = float(token)
+    except ValueError:
+        pass
+    else:
+        # float() also accepts "nan"/"inf", which are never valid readings
+        if math.isfinite(value):
+            return value
+
     cleaned = NUM_RE.sub("", token)
     if cleaned in {"", ".", "+", "-"}:
         raise ValueError(f"Empty or invalid numeric after cleaning: {token!r}")
     return float(cleaned)
 
 
-def parse_megatec_q1(line: str) -> Dict[str, Any]:
+@dataclass(slots=True)
+class UpsStatus:
     """
-    Parse a Megatec Q1 status line, tolerating stray control characters.
+    One parsed Megatec Q1 sample.
 
-    Expected logical format:
-        MMM.M NNN.N PPP.P QQQ RR.R SS.S TT.T b7b6b5b4b3b2b1b0
+    The 8-bit status word is kept as an int (flags_bits, b7 first on the
+    wire); the flag booleans are derived on access. to_dict() builds the
+    full field dict only when it is needed (MQTT publish).
+    """
 
-    Returns a dictionary with:
-        input_voltage
-        input_fault_voltage
-        output_voltage
-        load_percent
-        input_frequency
-        battery_voltage
-        temperature_c
-        flags_raw
-        on_battery
-        battery_low
-        avr_active
-        ups_failed
-        standby_type
-        test_in_progress
-        shutdown_active
-        beeper_on
+    input_voltage: float
+    input_fault_voltage: float
+    output_voltage: float
+    load_percent: int
+    input_frequency: float
+    battery_voltage: float
+    temperature_c: float
+    flags_bits: int
+
+    # Float fields, e.g. for rounding before publishing
+    FLOAT_FIELDS = (
+        "input_voltage",
+        "input_fault_voltage",
+        "output_voltage",
+        "input_frequency",
+        "battery_voltage",
+        "temperature_c",
+    )
+
+    @property
+    def flags_raw(self) -> str:
+        return f"{self.flags_bits:08b}"
+
+    @property
+    def on_battery(self) -> bool:
+        return bool(self.flags_bits & 0x80)
+
+    @property
+    def battery_low(self) -> bool:
+        return bool(self.flags_bits & 0x40)
+
+    @property
+    def avr_active(self) -> bool:
+        return bool(self.flags_bits & 0x20)
+
+    @property
+    def ups_failed(self) -> bool:
+        return bool(self.flags_bits & 0x10)
+
+    @property
+    def standby_type(self) -> bool:
+        return bool(self.flags_bits & 0x08)
+
+    @property
+    def test_in_progress(self) -> bool:
+        return bool(self.flags_bits & 0x04)
+
+    @property
+    def shutdown_active(self) -> bool:
+        return bool(self.flags_bits & 0x02)
+
+    @property
+    def beeper_on(self) -> bool:
+        return bool(self.flags_bits & 0x01)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return all numeric fields, flags_raw and the flag booleans."""
+        return {
+            "input_voltage": self.input_voltage,
+            "input_fault_voltage": self.input_fault_voltage,
+            "output_voltage": self.output_voltage,
+            "load_percent": self.load_percent,
+            "input_frequency": self.input_frequency,
+            "battery_voltage": self.battery_voltage,
+            "temperature_c": self.temperature_c,
+            "flags_raw": self.flags_raw,
+            "on_battery": self.on_battery,
+            "battery_low": self.battery_low,
+            "avr_active": self.avr_active,
+            "ups_failed": self.ups_failed,
+            "standby_type": self.standby_type,
+            "test_in_progress": self.test_in_progress,
+            "shutdown_active": self.shutdown_active,
+            "beeper_on": self.beeper_on,
+        }
+
+
+# Whole Megatec Q1 reply in one scan: seven numeric fields and the flag word.
+# Used with match() and ends at a field boundary, so a corrupted leading
+# field or an over-long flag word falls through to _split_megatec_q1()
+# instead of being parsed from the wrong columns.
+Q1_RE = re.compile(
+    r"\s*\(?\s*([-+]?\d+\.?\d*)\s+([-+]?\d+\.?\d*)\s+([-+]?\d+\.?\d*)\s+(\d+)"
+    r"\s+([-+]?\d+\.?\d*)\s+([-+]?\d+\.?\d*)\s+([-+]?\d+\.?\d*)\s+([01]{8})(?!\S)"
+)
+
+
+# Fixed column layout of a standard (cleaned) Q1 reply, separators at
+# columns 5, 11, 17, 21, 26, 31 and 36:
+#   "236.0 236.0 236.0 012 50.0 27.2 25.0 00001001"
+_Q1_FIXED_LEN = 45
+
+# Deletes every character a clean Q1 line may contain; anything left over
+# (e.g. "e", "_", "nan") sends the line to the regex path instead of float()
+_Q1_CLEAN_TABLE = str.maketrans("", "", "0123456789.+- ")
+
+
+def _slice_megatec_q1(
+    line: str,
+) -> Optional[Tuple[float, float, float, int, float, float, float, str]]:
+    """
+    Fast path for the standard fixed-width Q1 layout: read each field from
+    its known columns instead of scanning the line.
+
+    Returns None (caller falls back to Q1_RE) if the line does not have
+    the expected length, separators or field contents.
+    """
+    if (
+        len(line) != _Q1_FIXED_LEN
+        or line[5] != " "
+        or line[11] != " "
+        or line[17] != " "
+        or line[21] != " "
+        or line[26] != " "
+        or line[31] != " "
+        or line[36] != " "
+    ):
+        return None
+
+    flags = line[37:45]
+    if flags.strip("01") or line.translate(_Q1_CLEAN_TABLE):
+        return None
+
+    try:
+        return (
+            float(line[0:5]),  # input voltage
+            float(line[6:11]),  # input fault voltage
+            float(line[12:17]),  # output voltage
+            int(line[18:21]),  # load %
+            float(line[22:26]),  # input frequency
+            float(line[27:31]),  # battery voltage
+            float(line[32:36]),  # temperature
+            flags,
+        )
+    except ValueError:
+        return None
+
+
+def _split_megatec_q1(
+    line: str,
+) -> Tuple[float, float, float, int, float, float, float, str]:
+    """
+    Token-by-token fallback for Q1 lines that Q1_RE does not match
+    (e.g. stray control characters inside a field).
+
+    Returns:
+        (vin, vin_fault, vout, load_pct, freq, batt_v, temp_c, flags)
     """
     parts = line.split()
     if len(parts) < 8:
         raise ValueError(f"Not enough fields in Megatec line: {parts!r}")
 
-    vin = clean_num(parts[0])
-    vin_fault = clean_num(parts[1])
-    vout = clean_num(parts[2])
-    load_pct = int(clean_num(parts[3]))
-    freq = clean_num(parts[4])
-    batt_v = clean_num(parts[5])
-    temp_c = clean_num(parts[6])
-
     flags = parts[7].strip()
     flags = "".join(c for c in flags if c in "01")  # ensure only bits remain
 
@@ -840,26 +1544,57 @@ def parse_megatec_q1(line: str) -> Dict[str, Any]:
             f"Flags field should be 8 bits, got {flags!r} from {parts[7]!r}"
         )
 
-    b7, b6, b5, b4, b3, b2, b1, b0 = flags
-
-    return {
-        "input_voltage": vin,
-        "input_fault_voltage": vin_fault,
-        "output_voltage": vout,
-        "load_percent": load_pct,
-        "input_frequency": freq,
-        "battery_voltage": batt_v,
-        "temperature_c": temp_c,
-        "flags_raw": flags,
-        "on_battery": (b7 == "1"),
-        "battery_low": (b6 == "1"),
-        "avr_active": (b5 == "1"),
-        "ups_failed": (b4 == "1"),
-        "standby_type": (b3 == "1"),
-        "test_in_progress": (b2 == "1"),
-        "shutdown_active": (b1 == "1"),
-        "beeper_on": (b0 == "1"),
-    }
+    return (
+        clean_num(parts[0]),
+        clean_num(parts[1]),
+        clean_num(parts[2]),
+        int(clean_num(parts[3])),
+        clean_num(parts[4]),
+        clean_num(parts[5]),
+        clean_num(parts[6]),
+        flags,
+    )
+
+
+def parse_megatec_q1(line: str) -> UpsStatus:
+    """
+    Parse a Megatec Q1 status line, tolerating stray control characters.
+
+    Expected logical format:
+        MMM.M NNN.N PPP.P QQQ RR.R SS.S TT.T b7b6b5b4b3b2b1b0
+
+    Standard fixed-width lines are decoded by column (_slice_megatec_q1());
+    other well-formed lines are parsed with a single Q1_RE match; anything
+    else goes through the slower per-token _split_megatec_q1() path.
+
+    Returns:
+        UpsStatus with the numeric fields and the raw flag bits.
+    """
+    fields = _slice_megatec_q1(line)
+    m = None if fields is not None else Q1_RE.match(line)
+    if fields is not None:
+        vin, vin_fault, vout, load_pct, freq, batt_v, temp_c, flags = fields
+    elif m is not None:
+        g = m.groups()
+        vin, vin_fault, vout = map(float, g[0:3])
+        load_pct = int(g[3])
+        freq, batt_v, temp_c = map(float, g[4:7])
+        flags = g[7]
+    else:
+        vin, vin_fault, vout, load_pct, freq, batt_v, temp_c, flags = _split_megatec_q1(
+            line
+        )
+
+    return UpsStatus(
+        input_voltage=vin,
+        input_fault_voltage=vin_fault,
+        output_voltage=vout,
+        load_percent=load_pct,
+        input_frequency=freq,
+        battery_voltage=batt_v,
+        temperature_c=temp_c,
+        flags_bits=int(flags, 2),
+    )
 
 
 def find_ups(cfg: Dict[str, Any]) -> usb.core.Device:
@@ -908,15 +1643,36 @@ def find_ups(cfg: Dict[str, Any]) -> usb.core.Device:
 
     dev.set_configuration()
     usb.util.claim_interface(dev, 0)
+
+    # Timeout for any pyusb call that does not pass its own
+    dev.default_timeout = int(cfg.get("ups_timeout_ms", 5000))
+
     logger.info("UPS found and interface 0 claimed successfully")
     return dev
 
 
-def megatec_q1_from_usb(dev: usb.core.Device, timeout_ms: int) -> str:
+# wLength of the Q1 string-descriptor request
+Q1_REPLY_LEN = 102
+
+# Characters removed from the decoded Q1 descriptor text in one pass
+_Q1_STRIP_TABLE = str.maketrans("", "", "()\r\n\x00")
+
+
+def megatec_q1_from_usb(
+    dev: usb.core.Device,
+    timeout_ms: int,
+    fast_timeout_ms: int = 0,
+    retries: int = 0,
+) -> str:
     """
     Request a Megatec/Q1 status string via USB string descriptor
     (index 3, language 0x0409), as used by many MEC0003+UPSmart devices.
 
+    The transfer is first tried up to `retries` times with the short
+    `fast_timeout_ms`; only the final try waits the full `timeout_ms`.
+    This keeps a stuck read from stalling the loop for the full timeout
+    every poll. Only timeouts are retried; other USB errors are raised.
+
     Returns:
         Cleaned status string (parentheses, NULLs, and control characters
         stripped).
@@ -924,24 +1680,41 @@ def megatec_q1_from_usb(dev: usb.core.Device, timeout_ms: int) -> str:
     Raises:
         RuntimeError if the response is too short or cannot be decoded.
     """
-    raw = dev.ctrl_transfer(
-        0x80,  # bmRequestType: device-to-host, standard, device
-        0x06,  # bRequest: GET_DESCRIPTOR
-        0x0303,  # wValue: type=STRING(0x03), index=3
-        0x0409,  # wIndex: language ID (en-US)
-        102,  # wLength
-        timeout_ms,
-    )
+    # Reply buffer allocated once per device and filled in place by pyusb
+    buf = getattr(dev, "_q1_buf", None)
+    if buf is None:
+        buf = dev._q1_buf = array.array("B", bytes(Q1_REPLY_LEN))
 
-    if len(raw) < 4:
-        raise RuntimeError(f"UPS response too short: {list(raw)}")
+    attempt = 0
+    while True:
+        attempt += 1
+        last = attempt > retries
+        try:
+            n = dev.ctrl_transfer(
+                0x80,  # bmRequestType: device-to-host, standard, device
+                0x06,  # bRequest: GET_DESCRIPTOR
+                0x0303,  # wValue: type=STRING(0x03), index=3
+                0x0409,  # wIndex: language ID (en-US)
+                buf,  # read into buf (wLength = len(buf))
+                timeout_ms if last else fast_timeout_ms,
+            )
+            break
+        except usb.core.USBError as e:
+            if last or e.errno != errno.ETIMEDOUT:
+                raise
+            time.sleep(0.05)
+
+    if attempt > 1:
+        logger.info("UPS Q1 read needed %d attempts (timeouts)", attempt)
+
+    if n < 4:
+        raise RuntimeError(f"UPS response too short: {list(buf[:n])}")
 
     # USB string descriptor: [bLength, bDescType, UTF-16LE bytes...]
-    data_utf16 = bytes(raw[2:])
-    text = data_utf16.decode("utf-16le", errors="ignore").strip("\x00")
+    # Slice through a memoryview so the payload is copied only once.
+    text = memoryview(buf)[2:n].tobytes().decode("utf-16le", errors="ignore")
 
-    cleaned = text.strip().strip("()").strip("\r\n")
-    return cleaned
+    return text.translate(_Q1_STRIP_TABLE).strip()
 
 
 def _get_io_endpoints(
@@ -952,39 +1725,65 @@ def _get_io_endpoints(
 
     This is only used for optional beeper toggle ("Q" command) and not
     for regular status polling (which uses the descriptor method).
+
+    The endpoints are cached on the device object after the first lookup;
+    send_megatec_command() drops the cache on a USB error.
     """
+    ep_in = getattr(dev, "_cached_ep_in", None)
+    ep_out = getattr(dev, "_cached_ep_out", None)
+    if ep_in is not None and ep_out is not None:
+        return ep_in, ep_out
+
     cfg = dev.get_active_configuration()
     intf = cfg[(0, 0)]
 
-    ep_out = usb.util.find_descriptor(
-        intf,
-        custom_match=lambda e: usb.util.endpoint_direction(e.bEndpointAddress)
-        == usb.util.ENDPOINT_OUT,
-    )
-    ep_in = usb.util.find_descriptor(
-        intf,
-        custom_match=lambda e: usb.util.endpoint_direction(e.bEndpointAddress)
-        == usb.util.ENDPOINT_IN,
-    )
+    # Bit 7 of bEndpointAddress is the direction (set = IN)
+    ep_out = next((e for e in intf if not e.bEndpointAddress & 0x80), None)
+    ep_in = next((e for e in intf if e.bEndpointAddress & 0x80), None)
 
     if ep_out is None or ep_in is None:
         raise RuntimeError("Could not find both IN and OUT endpoints for UPS.")
 
+    dev._cached_ep_in = ep_in
+    dev._cached_ep_out = ep_out
     return ep_in, ep_out
 
 
-def send_megatec_command(dev: usb.core.Device, cmd: str, timeout_ms: int) -> None:
+def _clear_endpoint_cache(dev: usb.core.Device) -> None:
+    """
+    Forget the endpoints cached by _get_io_endpoints() (after a USB error
+    or device reset), so the next beeper command looks them up again.
+    """
+    dev._cached_ep_in = dev._cached_ep_out = None
+
+
+# Megatec "toggle beeper" command, pre-encoded
+MEGATEC_BEEPER_CMD = b"Q\r"
+
+
+def send_megatec_command(
+    dev: usb.core.Device, cmd: Union[bytes, str], timeout_ms: int
+) -> None:
     """
     Send a raw Megatec command (ASCII) over the UPS bulk OUT endpoint.
 
-    This is used only to toggle the beeper ("Q\\r") once per outage
-    if configured to do so.
+    This is used only to toggle the beeper (MEGATEC_BEEPER_CMD) once per
+    outage if configured to do so. `cmd` should be pre-encoded bytes; a
+    str is still accepted and encoded as ASCII.
 
     No reply is expected.
     """
+    if isinstance(cmd, str):
+        cmd = cmd.encode("ascii")
+
     ep_in, ep_out = _get_io_endpoints(dev)
     _ = ep_in  # unused; retained for completeness / future expansion
-    ep_out.write(cmd.encode("ascii"), timeout=timeout_ms)
+    try:
+        ep_out.write(cmd, timeout=timeout_ms)
+    except usb.core.USBError:
+        # Device may have been reset; look the endpoints up again next time.
+        _clear_endpoint_cache(dev)
+        raise
 
 
 def disable_beeper_if_needed(cfg: Dict[str, Any], dev: usb.core.Device) -> None:
@@ -1000,50 +1799,65 @@ def disable_beeper_if_needed(cfg: Dict[str, Any], dev: usb.core.Device) -> None:
 
     timeout_ms = int(cfg.get("ups_timeout_ms", 5000))
     try:
-        line = megatec_q1_from_usb(dev, timeout_ms)
+        line = megatec_q1_from_usb(
+            dev,
+            timeout_ms,
+            int(cfg.get("ups_timeout_fast_ms", 500)),
+            int(cfg.get("ups_timeout_retries", 3)),
+        )
         status = parse_megatec_q1(line)
     except Exception as e:
         logger.warning("Could not read initial UPS status to check beeper: %s", e)
         return
 
-    if status.get("beeper_on"):
+    if status.beeper_on:
         logger.info("UPS beeper is currently ON – sending 'Q\\r' to disable it.")
         try:
-            send_megatec_command(dev, "Q\r", timeout_ms)
+            send_megatec_command(dev, MEGATEC_BEEPER_CMD, timeout_ms)
         except Exception as e:
             logger.warning("Failed to send beeper toggle command: %s", e)
     else:
         logger.info("UPS beeper already disabled; no action needed.")
 
 
-def read_ups_status(cfg: Dict[str, Any], dev: usb.core.Device) -> Dict[str, Any]:
+def read_ups_status(
+    dev: usb.core.Device,
+    timeout_ms: int,
+    fast_timeout_ms: int = 0,
+    retries: int = 0,
+) -> UpsStatus:
     """
     Retrieve and parse a single UPS status sample.
 
+    The timeouts are passed in already converted (main_control_loop()
+    reads them from the config once) since this runs on every poll; see
+    megatec_q1_from_usb() for their meaning.
+
     Steps:
         - Request descriptor-based Megatec/Q1 string using megatec_q1_from_usb().
         - Parse the line via parse_megatec_q1().
         - Log a concise summary for debugging.
 
     Returns:
-        Dictionary with parsed fields (see parse_megatec_q1()).
+        UpsStatus (see parse_megatec_q1()).
     """
-    timeout_ms = int(cfg.get("ups_timeout_ms", 5000))
-    line = megatec_q1_from_usb(dev, timeout_ms)
+    line = megatec_q1_from_usb(dev, timeout_ms, fast_timeout_ms, retries)
     status = parse_megatec_q1(line)
 
-    # Concise debug summary of the most important values
-    logger.info(
-        "UPS: Vin=%.1fV, Vout=%.1fV, Load=%d%%, Batt=%.2fV, "
-        "on_battery=%s, batt_low=%s, flags=%s",
-        status["input_voltage"],
-        status["output_voltage"],
-        status["load_percent"],
-        status["battery_voltage"],
-        status["on_battery"],
-        status["battery_low"],
-        status["flags_raw"],
-    )
+    # Concise debug summary of the most important values. This runs every
+    # poll, so it is DEBUG and skipped entirely unless DEBUG is enabled.
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(
+            "UPS: Vin=%.1fV, Vout=%.1fV, Load=%d%%, Batt=%.2fV, "
+            "on_battery=%s, batt_low=%s, flags=%s",
+            status.input_voltage,
+            status.output_voltage,
+            status.load_percent,
+            status.battery_voltage,
+            status.on_battery,
+            status.battery_low,
+            status.flags_raw,
+        )
 
     return status
 
@@ -1053,37 +1867,103 @@ def read_ups_status(cfg: Dict[str, Any], dev: usb.core.Device) -> Dict[str, Any]
 # ---------------------------------------------------------------------------
 
 
+def apply_loop_scheduling(cfg: Dict[str, Any]) -> None:
+    """
+    Optionally pin the calling thread (the control loop) to one CPU and/or
+    give it SCHED_FIFO priority, so it is not descheduled during an outage
+    on a busy host. Both are off by default (pin_cpu=-1, rt_priority=0).
+
+    Threads already running (array, MQTT, logging) keep normal scheduling,
+    but threads started later from the calling thread inherit it. The
+    policy is set with SCHED_RESET_ON_FORK, so child processes (ssh, etc.)
+    fall back to normal scheduling; the CPU pinning is still inherited.
+    Failures (e.g. missing CAP_SYS_NICE) are logged and otherwise ignored.
+    """
+    pin_cpu = int(cfg.get("pin_cpu", -1))
+    rt_priority = int(cfg.get("rt_priority", 0))
+
+    if pin_cpu >= 0:
+        try:
+            os.sched_setaffinity(0, {pin_cpu})
+            logger.info("Control loop pinned to CPU %d", pin_cpu)
+        except (AttributeError, OSError) as e:
+            logger.warning("Could not pin control loop to CPU %d: %s", pin_cpu, e)
+
+    if rt_priority > 0:
+        try:
+            os.sched_setscheduler(
+                0,
+                os.SCHED_FIFO | os.SCHED_RESET_ON_FORK,
+                os.sched_param(rt_priority),
+            )
+            logger.info("Control loop using SCHED_FIFO priority %d", rt_priority)
+        except PermissionError as e:
+            logger.warning(
+                "Could not set SCHED_FIFO priority %d: %s "
+                "(needs CAP_SYS_NICE, e.g. AmbientCapabilities=CAP_SYS_NICE "
+                "in the systemd unit)",
+                rt_priority,
+                e,
+            )
+        except (AttributeError, OSError) as e:
+            logger.warning("Could not set SCHED_FIFO priority %d: %s", rt_priority, e)
+
+
 def main_control_loop(
-    cfg: Dict[str, Any], mqtt_client: Optional["mqtt.Client"]
+    cfg: Dict[str, Any],
+    mqtt_client: Optional["mqtt.Client"],
+    array_status: ArrayStatusSlot,
 ) -> None:
     """
     Main hybrid loop that:
 
-        - Continuously polls the UPS at `ups_poll_interval`.
+        - Continuously polls the UPS: every `ups_poll_interval_idle` on
+          mains, every `ups_poll_interval_battery` on battery, and once more
+          straight away after a mains/battery transition.
         - Interprets power states (mains vs battery) and battery voltage.
         - Triggers Unraid actions based on thresholds:
               * Stop array at LOW_BATT_VOLT (on battery)
               * Shutdown Unraid at EXTRA_LOW_BATT_VOLT (on battery)
               * Start array once power restored and
                 voltage >= ENABLE_ARRAY_VOLTAGE for power_stable_time.
-        - Independently polls Unraid array status at
-          `status_check_interval` for logging and confirmation.
-
-    All timing in this function is based on time and the configured
-    intervals. The UPS is re-discovered if the USB device disappears.
+        - Reads the latest Unraid array status from `array_status`, which
+          array_poll_loop() refreshes on its own thread. A start request is
+          skipped while the array is already known to be STARTED.
+
+    All interval math in this function uses time.monotonic(), so wall-clock
+    jumps (NTP, manual changes) cannot skew stability timers or pacing.
+
+    On a USB error the cached device is reset and the read retried; a
+    short/garbled reply just leads to another poll. The UPS is only
+    re-discovered (full bus scan) after two USB errors or MAX_BAD_REPLIES
+    bad replies in a row, or straight away if the device disappears
+    (ENODEV).
     """
 
     # Extract core timing / threshold values
     ups_poll_interval = int(cfg.get("ups_poll_interval", 2))
-    status_check_interval = int(cfg.get("status_check_interval", 10))
+    ups_poll_interval_idle = int(cfg.get("ups_poll_interval_idle", 10))
+    ups_poll_interval_battery = int(cfg.get("ups_poll_interval_battery", 1))
     power_stable_time = int(cfg.get("power_stable_time", 180))
 
+    ups_timeout_ms = int(cfg.get("ups_timeout_ms", 5000))
+    ups_timeout_fast_ms = int(cfg.get("ups_timeout_fast_ms", 500))
+    ups_timeout_retries = int(cfg.get("ups_timeout_retries", 3))
+
     low_batt = float(cfg.get("low_batt_volt", 24.7))
     extra_low_batt = float(cfg.get("extra_low_batt_volt", 22.5))
     enable_array_voltage = float(cfg.get("enable_array_voltage", 23.0))
 
-    logger.info("UPS poll interval: %ds", ups_poll_interval)
-    logger.info("Array status check interval: %ds", status_check_interval)
+    logger.info(
+        "UPS poll interval: %ds on mains, %ds on battery (retry %ds)",
+        ups_poll_interval_idle,
+        ups_poll_interval_battery,
+        ups_poll_interval,
+    )
+    logger.info(
+        "Array status check interval: %ds",
+        int(cfg.get("status_check_interval", 10)),
+    )
     logger.info("power_stable_time: %ds", power_stable_time)
     logger.info(
         "Thresholds: LOW_BATT_VOLT=%.2fV, EXTRA_LOW_BATT_VOLT=%.2fV, "
@@ -1093,20 +1973,44 @@ def main_control_loop(
         enable_array_voltage,
     )
 
+    apply_loop_scheduling(cfg)
+
     dev: Optional[usb.core.Device] = None
 
+    # Consecutive USB errors / unparseable replies on the current handle
+    usb_failures = 0
+    bad_replies = 0
+    MAX_BAD_REPLIES = 3
+
+    # Delay before the next UPS discovery attempt; doubles after each failed
+    # discovery/read (up to MAX_DISCOVERY_BACKOFF) and resets on a good read
+    MAX_DISCOVERY_BACKOFF = 60.0  # seconds
+    discovery_backoff = float(ups_poll_interval)
+
     # Track mains/UPS state for edge detection
     last_on_battery: Optional[bool] = None
 
     # Track cumulative mains + voltage stability time
     stable_mains_time: float = 0.0
 
-    # Wall-clock timestamp of last Unraid status check
-    last_status_check_ts: float = time.time()
+    # Monotonic timestamp of the previous successful UPS sample, used to
+    # accumulate stability time now that the poll interval varies. Cleared
+    # whenever a read fails, so time without samples is never credited.
+    last_sample_ts: Optional[float] = None
+
+    # Most stability time one sample may add (the longest regular poll gap)
+    max_sample_dt = float(max(ups_poll_interval_idle, ups_poll_interval_battery))
 
-    # When we last attempted to start the array (so we don't hammer it)
-    last_start_attempt_ts: float = 0.0
+    # When we last attempted to start the array (so we don't hammer it).
+    # Starts one interval in the past so the first attempt is not delayed.
     MIN_START_RETRY_INTERVAL = 60.0  # seconds between start attempts
+    last_start_attempt_ts: float = time.monotonic() - MIN_START_RETRY_INTERVAL
+
+    # Raw UPS samples buffered for publish_ups_batch() (if enabled)
+    batch_size = int(cfg.get("mqtt_batch_size", 0))
+    batch_max_age = int(cfg.get("mqtt_batch_max_age", 15))
+    ups_batch: List[Dict[str, Any]] = []
+    last_batch_publish = time.monotonic()
 
     # Flags about last outage (for logging only)
     array_stopped_this_outage = False
@@ -1114,7 +2018,7 @@ def main_control_loop(
 
     # The script runs indefinitely under systemd
     while True:
-        loop_start = time.time()
+        loop_start = time.monotonic()
 
         # Ensure we have a UPS device; try to (re)discover if needed.
         if dev is None:
@@ -1123,30 +2027,111 @@ def main_control_loop(
                 disable_beeper_if_needed(cfg, dev)
             except Exception as e:
                 logger.error("Unable to find/initialize UPS: %s", e)
-                logger.info("Retrying UPS discovery in %ds", ups_poll_interval)
-                time.sleep(ups_poll_interval)
+                last_sample_ts = None
+                logger.info("Retrying UPS discovery in %.0fs", discovery_backoff)
+                time.sleep(discovery_backoff)
+                discovery_backoff = min(discovery_backoff * 2, MAX_DISCOVERY_BACKOFF)
                 continue
 
         # Attempt to read UPS status
+        release_dev = False
         try:
-            status = read_ups_status(cfg, dev)
+            status = read_ups_status(
+                dev, ups_timeout_ms, ups_timeout_fast_ms, ups_timeout_retries
+            )
+            usb_failures = 0
+            bad_replies = 0
+            discovery_backoff = float(ups_poll_interval)
+
+            if mqtt_client is not None:
+                # Publish UPS sample to MQTT (if changed). A mains/battery
+                # transition is sent with QoS 1 and retained so subscribers
+                # (including late joiners) see the power change.
+                transition = (
+                    last_on_battery is not None and status.on_battery != last_on_battery
+                )
+                publish_ups_status(
+                    cfg,
+                    mqtt_client,
+                    status,
+                    qos=1 if transition else 0,
+                    retain=transition,
+                )
 
-            # Publish each UPS sample to MQTT (if enabled).
-            publish_ups_status(cfg, mqtt_client, status)
+                # Optionally also buffer every sample for the batch topic.
+                if batch_size > 0:
+                    ups_batch.append(_ups_payload(status))
+                    now = time.monotonic()
+                    if (
+                        len(ups_batch) >= batch_size
+                        or now - last_batch_publish >= batch_max_age
+                    ):
+                        publish_ups_batch(cfg, mqtt_client, ups_batch)
+                        last_batch_publish = now
+
+        except usb.core.USBError as e:
+            last_sample_ts = None
+            usb_failures += 1
+            if usb_failures < 2 and e.errno != errno.ENODEV:
+                # Cheap recovery first: reset the cached handle and retry,
+                # instead of re-enumerating the bus via find_ups().
+                logger.warning("USB error querying UPS: %s; resetting device", e)
+                _clear_endpoint_cache(dev)
+                try:
+                    dev.reset()
+                except Exception as reset_err:
+                    logger.warning("UPS reset failed: %s", reset_err)
+                time.sleep(0.1)
+                continue
+
+            if e.errno == errno.ENODEV:
+                logger.error("UPS disconnected: %s", e)
+            else:
+                logger.error("Repeated USB errors querying UPS: %s", e)
+            release_dev = True
+
+        except (ValueError, RuntimeError) as e:
+            # Short or garbled Q1 reply: the USB handle itself is fine, so
+            # keep it and poll again; only give up on it after several.
+            last_sample_ts = None
+            bad_replies += 1
+            if bad_replies < MAX_BAD_REPLIES:
+                logger.warning("Bad UPS reply (%d in a row): %s", bad_replies, e)
+                time.sleep(ups_poll_interval)
+                continue
+
+            logger.error("Repeated bad UPS replies: %s", e)
+            release_dev = True
 
         except Exception as e:
             logger.error("Error querying UPS: %s", e)
+            last_sample_ts = None
+            release_dev = True
+
+        if release_dev:
             logger.info("Releasing UPS handle and retrying discovery next loop")
             try:
                 usb.util.dispose_resources(dev)
             except Exception:
                 pass
             dev = None
-            time.sleep(ups_poll_interval)
+            usb_failures = 0
+            bad_replies = 0
+            time.sleep(discovery_backoff)
+            discovery_backoff = min(discovery_backoff * 2, MAX_DISCOVERY_BACKOFF)
             continue
 
-        on_battery = bool(status["on_battery"])
-        batt_v = float(status["battery_voltage"])
+        on_battery = status.on_battery
+        batt_v = status.battery_voltage
+
+        sample_ts = time.monotonic()
+        sample_dt = 0.0
+        if last_sample_ts is not None:
+            sample_dt = min(sample_ts - last_sample_ts, max_sample_dt)
+        last_sample_ts = sample_ts
+
+        # Poll slowly on mains, fast on battery; re-poll at once on a change
+        next_sleep = ups_poll_interval_battery if on_battery else ups_poll_interval_idle
 
         # Detect transitions between mains and battery
         if last_on_battery is None:
@@ -1158,8 +2143,11 @@ def main_control_loop(
         elif last_on_battery and not on_battery:
             # Transition: battery -> mains
             logger.warning("Mains power RESTORED (UPS back on line).")
-            # Reset stability timer so we measure clean continuous uptime
+            # Reset stability timer so we measure clean continuous uptime;
+            # the time before this first mains sample does not count
             stable_mains_time = 0.0
+            sample_dt = 0.0
+            next_sleep = 0
         elif not last_on_battery and on_battery:
             # Transition: mains -> battery
             logger.warning("Mains power LOST – UPS is now on battery.")
@@ -1168,9 +2156,14 @@ def main_control_loop(
             nas_shutdown_this_outage = False
             # Any mains stability timer is no longer relevant
             stable_mains_time = 0.0
+            sample_dt = 0.0
+            next_sleep = 0
 
         last_on_battery = on_battery
 
+        # Array actions decided this iteration; flushed in one SSH batch below
+        pending_actions: List[str] = []
+
         # -------------------------------------------------------------------
         # Branch 1: UPS is ON BATTERY (mains failed)
         # -------------------------------------------------------------------
@@ -1178,45 +2171,28 @@ def main_control_loop(
             # While on battery, mains stability time is meaningless
             stable_mains_time = 0.0
 
-            # 1) Stop array when battery at or below LOW_BATT_VOLT
-            if not array_stopped_this_outage and batt_v <= low_batt:
-                logger.warning(
-                    "Battery voltage %.2fV <= LOW_BATT_VOLT %.2fV – "
-                    "requesting Unraid array STOP.",
-                    batt_v,
-                    low_batt,
-                )
-
-                if stop_array_via_update(cfg):
-                    logger.info(
-                        "Array stop request succeeded for this outage (low battery)."
-                    )
-                    array_stopped_this_outage = True
-                else:
-                    logger.error(
-                        "Array stop request FAILED; will retry while "
-                        "voltage remains below threshold."
+            # Once both actions have succeeded for this outage there is
+            # nothing left to check until mains returns.
+            if not (array_stopped_this_outage and nas_shutdown_this_outage):
+                # 1) Stop array when battery at or below LOW_BATT_VOLT
+                if not array_stopped_this_outage and batt_v <= low_batt:
+                    logger.warning(
+                        "Battery voltage %.2fV <= LOW_BATT_VOLT %.2fV – "
+                        "requesting Unraid array STOP.",
+                        batt_v,
+                        low_batt,
                     )
+                    pending_actions.append("stop")
 
-            # 2) Shutdown NAS when battery at or below EXTRA_LOW_BATT_VOLT
-            if not nas_shutdown_this_outage and batt_v <= extra_low_batt:
-                logger.error(
-                    "Battery voltage %.2fV <= EXTRA_LOW_BATT_VOLT %.2fV – "
-                    "requesting Unraid SHUTDOWN.",
-                    batt_v,
-                    extra_low_batt,
-                )
-
-                if shutdown_nas_via_update(cfg):
-                    logger.info(
-                        "Shutdown request succeeded; Unraid should be powering down."
-                    )
-                    nas_shutdown_this_outage = True
-                else:
+                # 2) Shutdown NAS when battery at or below EXTRA_LOW_BATT_VOLT
+                if not nas_shutdown_this_outage and batt_v <= extra_low_batt:
                     logger.error(
-                        "Shutdown request FAILED; will retry while "
-                        "voltage remains below threshold."
+                        "Battery voltage %.2fV <= EXTRA_LOW_BATT_VOLT %.2fV – "
+                        "requesting Unraid SHUTDOWN.",
+                        batt_v,
+                        extra_low_batt,
                     )
+                    pending_actions.append("shutdown")
 
         # -------------------------------------------------------------------
         # Branch 2: UPS is on MAINS (power present)
@@ -1227,7 +2203,7 @@ def main_control_loop(
             if batt_v >= enable_array_voltage:
                 # Voltage meets our enable threshold – accumulate
                 # continuous stability time.
-                stable_mains_time += ups_poll_interval
+                stable_mains_time += sample_dt
             else:
                 # Voltage below threshold; reset stability timer.
                 if stable_mains_time > 0:
@@ -1242,9 +2218,13 @@ def main_control_loop(
             # When mains + voltage have been stable long enough, attempt
             # to start the array periodically.
             if stable_mains_time >= power_stable_time:
-                now = time.time()
+                now = time.monotonic()
                 time_since_last_start = now - last_start_attempt_ts
-                if time_since_last_start >= MIN_START_RETRY_INTERVAL:
+                array_started, _ = array_status.get()
+                if (
+                    time_since_last_start >= MIN_START_RETRY_INTERVAL
+                    and not array_started
+                ):
                     logger.info(
                         "Mains power + battery voltage have been stable for "
                         "%.0fs (>= %ds) and Batt=%.2fV >= %.2fV – "
@@ -1255,39 +2235,64 @@ def main_control_loop(
                         enable_array_voltage,
                     )
                     last_start_attempt_ts = now
-                    if start_array_via_update(cfg):
-                        logger.info(
-                            "Start array request sent successfully; "
-                            "will verify via periodic status checks."
-                        )
-                    else:
-                        logger.error(
-                            "Start array request FAILED; will retry in "
-                            "%.0f seconds if conditions remain stable.",
-                            MIN_START_RETRY_INTERVAL,
-                        )
+                    pending_actions.append("start")
 
         # -------------------------------------------------------------------
-        # Periodic Unraid status check (independent from UPS logic)
+        # Flush array actions in one SSH round trip; the fresh status read
+        # at the end of the batch updates the shared array status.
         # -------------------------------------------------------------------
-        now = time.time()
-        if now - last_status_check_ts >= status_check_interval:
-            last_status_check_ts = now
+        if pending_actions:
+            batch = run_remote_batch(cfg, pending_actions)
+            results = batch["results"]
 
-            started, raw = get_array_status(cfg)
-            if started:
-                logger.info("Periodic check: Unraid array is STARTED.")
-            else:
-                logger.warning("Periodic check: Unraid array is NOT started.")
+            if "stop" in results:
+                if results["stop"]:
+                    logger.info(
+                        "Array stop request succeeded for this outage (low battery)."
+                    )
+                    array_stopped_this_outage = True
+                else:
+                    logger.error(
+                        "Array stop request FAILED; will retry while "
+                        "voltage remains below threshold."
+                    )
+
+            if "shutdown" in results:
+                if results["shutdown"]:
+                    logger.info(
+                        "Shutdown request succeeded; Unraid should be powering down."
+                    )
+                    nas_shutdown_this_outage = True
+                else:
+                    logger.error(
+                        "Shutdown request FAILED; will retry while "
+                        "voltage remains below threshold."
+                    )
 
-            if raw:
-                logger.info("Unraid raw status output:\n%s", raw)
+            if "start" in results:
+                if results["start"]:
+                    logger.info(
+                        "Start array request sent successfully; "
+                        "will verify via periodic status checks."
+                    )
+                else:
+                    logger.error(
+                        "Start array request FAILED; will retry in "
+                        "%.0f seconds if conditions remain stable.",
+                        MIN_START_RETRY_INTERVAL,
+                    )
 
-            # Publish current array state to MQTT (if enabled).
-            publish_array_status(cfg, mqtt_client, started, raw)
+            report_array_status(
+                cfg,
+                mqtt_client,
+                array_status,
+                bool(batch["started"]),
+                batch["raw_status"],
+            )
 
-        # Sleep so that loop timing approximates ups_poll_interval
-        sleep_time = max(0.0, ups_poll_interval - (time.time() - loop_start))
+        # Sleep until the next poll is due, measured from the loop start
+        next_deadline = loop_start + next_sleep
+        sleep_time = next_deadline - time.monotonic()
         if sleep_time > 0:
             time.sleep(sleep_time)
 
@@ -1297,19 +2302,19 @@ def main_control_loop(
 # ---------------------------------------------------------------------------
 
 
-def main() -> None:
+def run() -> None:
     """
-    Top-level entry point.
+    Run the daemon once logging is configured.
 
     High-level steps:
 
-        1. Configure logging (file or stderr fallback).
-        2. Load configuration from CONFIG_PATH.
-        3. Validate that host and user are set.
+        1. Load configuration from CONFIG_PATH.
+        2. Validate that host and user are set, and that the battery
+           thresholds are ordered (logged as an error if not).
+        3. Start the array status poll thread (array_poll_loop()).
         4. Enter the main_control_loop(), which never returns under
            normal operation (systemd supervises the process).
     """
-    setup_logging(LOG_PATH)
     logger.info("nas_monitor starting up (UPS + Unraid integration)")
 
     cfg = load_config(CONFIG_PATH)
@@ -1321,17 +2326,50 @@ def main() -> None:
         logger.error("host and/or user not set in config, exiting.")
         return
 
+    # The array stop is meant to happen before the host shutdown.
+    low_batt = float(cfg.get("low_batt_volt", 24.7))
+    extra_low_batt = float(cfg.get("extra_low_batt_volt", 22.5))
+    if extra_low_batt > low_batt:
+        logger.error(
+            "Config error: extra_low_batt_volt (%.2fV) is above low_batt_volt "
+            "(%.2fV); the shutdown will be requested before the array stop.",
+            extra_low_batt,
+            low_batt,
+        )
+
+    # SSH options + target never change at runtime; build them once.
+    cfg["_ssh_prefix"] = build_ssh_prefix(cfg)
+
     # Initialise MQTT (if enabled and available). The returned client will
     # be used for all subsequent UPS/array status publishes.
     mqtt_client = setup_mqtt(cfg)
 
+    array_source = str(cfg.get("array_status_source", "ssh")).lower()
+    if mqtt_client is None and array_source == "mqtt":
+        logger.error("array_status_source=mqtt needs MQTT; using SSH instead.")
+        cfg["array_status_source"] = "ssh"
+
+    # Unraid status is polled on its own thread so slow SSH calls never
+    # hold up UPS polling.
+    array_status = ArrayStatusSlot()
+    stop_event = threading.Event()
+    array_thread = threading.Thread(
+        target=array_poll_loop,
+        args=(cfg, mqtt_client, array_status, stop_event),
+        name="array-status",
+        daemon=True,
+    )
+    array_thread.start()
+
     try:
-        main_control_loop(cfg, mqtt_client)
+        main_control_loop(cfg, mqtt_client, array_status)
     except KeyboardInterrupt:
         logger.info("Received KeyboardInterrupt; exiting.")
     except Exception as e:
         logger.exception("Unhandled exception in main_control_loop: %s", e)
     finally:
+        stop_event.set()
+
         # Cleanly stop MQTT network loop if it was started.
         if mqtt_client is not None:
             try:
@@ -1340,6 +2378,28 @@ def main() -> None:
             except Exception:
                 pass
 
+        close_ssh_master(cfg)
+
+
+def main() -> None:
+    """
+    Top-level entry point: configure logging (file or stderr fallback),
+    then run().
+
+    The log listener is stopped on every exit path, including early
+    config errors and unexpected exceptions, so queued records are
+    flushed before the process exits.
+    """
+    log_listener = setup_logging(LOG_PATH)
+    try:
+        run()
+    except Exception as e:
+        logger.exception("Unhandled exception during startup: %s", e)
+        raise
+    finally:
+        if log_listener is not None:
+            log_listener.stop()
+
 
 if __name__ == "__main__":
     main()
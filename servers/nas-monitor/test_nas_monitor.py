@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Tests for the Megatec Q1 parser in nas_monitor.py.
+
+Run from this directory (pyusb must be installed, as for the monitor):
+    python3 -m unittest test_nas_monitor
+"""
+
+import unittest
+
+import nas_monitor
+
+
+class ParseMegatecQ1Test(unittest.TestCase):
+    def test_clean_line(self):
+        status = nas_monitor.parse_megatec_q1(
+            "(236.0 236.0 236.0 012 50.0 27.2 25.0 10001001"
+        )
+        self.assertEqual(status.input_voltage, 236.0)
+        self.assertEqual(status.battery_voltage, 27.2)
+        self.assertTrue(status.on_battery)
+        self.assertTrue(status.beeper_on)
+
+    def test_corrupted_leading_field_is_not_shifted(self):
+        # Q1_RE must not skip the broken "2#36.0" and start at "36.0"
+        status = nas_monitor.parse_megatec_q1(
+            "2#36.0 236.0 236.0 012 50.0 27.2 25.0 00001001"
+        )
+        self.assertEqual(status.input_voltage, 236.0)
+        self.assertEqual(status.output_voltage, 236.0)
+
+    def test_nine_bit_flag_field_is_rejected(self):
+        # A stray extra bit must not be truncated to 8 (it shifts every flag)
+        with self.assertRaises(ValueError):
+            nas_monitor.parse_megatec_q1(
+                "236.0 236.0 236.0 012 50.0 27.2 25.0 000010011"
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,4 +1,5 @@
 #!/usr/bin/env python3
+import array
 import usb.core
 import usb.util
 import time
@@ -11,13 +12,26 @@ PRODUCT_ID = 0x0000
 TIMEOUT = 5000  # ms for USB control transfer
 
 POLL_INTERVAL = 2.0  # seconds between polls
+STATUS_PRINT_EVERY = 30  # print an unchanged status line every N polls
 
 # How long we tolerate being on battery before shutdown (seconds)
 GRACE_ON_BATTERY = 300  # e.g. 5 minutes
 
 # Set to True to actually call shutdown
 ENABLE_SHUTDOWN = False
-SHUTDOWN_CMD = ["sudo", "shutdown", "-h", "now", "UPS battery low"]
+# Ask systemd-logind for a power-off directly (one D-Bus call; the script
+# runs as root, see readme.md, so no sudo/shutdown wrapper is needed)
+SHUTDOWN_CMD = [
+    "busctl",
+    "call",
+    "org.freedesktop.login1",
+    "/org/freedesktop/login1",
+    "org.freedesktop.login1.Manager",
+    "PowerOff",
+    "b",
+    "false",
+]
+SHUTDOWN_TIMEOUT = 10  # seconds; busctl returns as soon as logind answers
 # ----------------------------
 
 # ---------------------------- CONFIG ----------------------------
@@ -26,6 +40,23 @@ LOW_BATT_VOLT = 24.7  # V, software low-voltage threshold for 24 V pack
 
 NUM_RE = re.compile(r"[^0-9.+-]")  # characters to strip from numeric tokens
 
+# A clean Q1 line in one match: seven numeric fields + the 8 flag bits
+Q1_RE = re.compile(
+    r"\s*\(?([\d.+-]+)\s+([\d.+-]+)\s+([\d.+-]+)\s+([\d.+-]+)"
+    r"\s+([\d.+-]+)\s+([\d.+-]+)\s+([\d.+-]+)\s+([01]{8})(?!\S)"
+)
+
+MEGATEC_BEEPER_CMD = b"Q\r"  # toggles the beeper on Megatec devices
+MEGATEC_Q1_CMD = b"Q1\r"  # requests a status line
+Q1_BULK_READ_LEN = 128  # multiple of wMaxPacketSize (64)
+Q1_BULK_MAX_FAILURES = 3  # timeouts/bad replies in a row before bulk is dropped
+
+# Reused by every bulk Q1 read (PyUSB fills it in place and returns the count)
+Q1_BULK_BUF = array.array("B", bytes(Q1_BULK_READ_LEN))
+
+# Framing removed from a Q1 reply in one str.translate() pass
+Q1_DELETE_TABLE = {ord(c): None for c in "()\r\n\x00"}
+
 
 def find_ups():
     """Find and claim the MEC0003 UPS device."""
@@ -63,14 +94,70 @@ def megatec_q1_from_usb(dev):
         raise RuntimeError(f"Response too short: {list(raw)}")
 
     # USB string descriptor: [bLength, bDescType, UTF-16LE...]
-    data_utf16 = bytes(raw[2:])
-    text = data_utf16.decode("utf-16le", errors="ignore").strip("\x00")
+    # raw is an array('B'); slice it via memoryview to copy the payload once
+    data_utf16 = memoryview(raw)[2:].tobytes()
+    text = data_utf16.decode("utf-16le", errors="ignore")
 
-    # Strip parentheses and control chars
-    cleaned = text.strip().strip("()").strip("\r\n")
+    # Drop parentheses, CR/LF and NUL padding
+    cleaned = text.translate(Q1_DELETE_TABLE).strip()
     return cleaned
 
 
+def megatec_q1_from_bulk(dev):
+    """
+    Request a Megatec/Q1 status line over the bulk OUT/IN endpoints
+    (no control transfer). Reads until the terminating CR arrives; a
+    reply still incomplete after TIMEOUT raises ValueError (or USBError
+    if the read itself times out).
+    """
+    ep_in, ep_out = _get_io_endpoints(dev)
+    ep_out.write(MEGATEC_Q1_CMD)
+
+    data = bytearray()
+    deadline = time.monotonic() + TIMEOUT / 1000
+    while b"\r" not in data:
+        remaining_ms = int((deadline - time.monotonic()) * 1000)
+        if remaining_ms <= 0:
+            raise ValueError(f"Incomplete bulk Q1 reply: {bytes(data)!r}")
+        n = ep_in.read(Q1_BULK_BUF, remaining_ms)
+        data += memoryview(Q1_BULK_BUF)[:n]
+
+    text = data.decode("ascii", errors="ignore")
+    if "(" not in text:
+        raise ValueError(f"Unexpected bulk Q1 reply: {text!r}")
+
+    return text.translate(Q1_DELETE_TABLE).strip()
+
+
+def read_q1_line(dev):
+    """
+    Read a Q1 status line, preferring the bulk endpoints, with the
+    string-descriptor path (megatec_q1_from_usb) as fallback.
+
+    - Missing bulk endpoints: bulk is dropped for this device at once.
+    - Any USBError or bad reply: this poll falls back; after
+      Q1_BULK_MAX_FAILURES in a row bulk is dropped for this device.
+      (If the device is gone, the descriptor read raises in turn.)
+    """
+    if getattr(dev, "_q1_bulk", True):
+        try:
+            line = megatec_q1_from_bulk(dev)
+            dev._q1_bulk_failures = 0
+            return line
+        except RuntimeError as e:
+            print("No bulk endpoints, using string descriptor instead:", e)
+            dev._q1_bulk = False
+        except (usb.core.USBError, ValueError) as e:
+            failures = getattr(dev, "_q1_bulk_failures", 0) + 1
+            dev._q1_bulk_failures = failures
+            print(f"Bulk Q1 read failed ({failures}x), using string descriptor:", e)
+            if failures >= Q1_BULK_MAX_FAILURES:
+                print("Bulk Q1 keeps failing; using string descriptor from now on.")
+                dev._q1_bulk = False
+
+    return megatec_q1_from_usb(dev)
+
+
 def clean_num(token: str) -> float:
     """Strip non-numeric noise and convert to float."""
     cleaned = NUM_RE.sub("", token)
@@ -85,30 +172,44 @@ def parse_megatec_q1(line: str):
 
     Expected logical format:
       MMM.M NNN.N PPP.P QQQ RR.R SS.S TT.T b7b6b5b4b3b2b1b0
-    """
-    parts = line.split()
-    if len(parts) < 8:
-        raise ValueError(f"Not enough fields in Megatec line: {parts!r}")
-
-    # Clean numeric tokens individually
-    vin = clean_num(parts[0])
-    vin_fault = clean_num(parts[1])
-    vout = clean_num(parts[2])
-    load_pct = int(clean_num(parts[3]))
-    freq = clean_num(parts[4])
-    batt_v = clean_num(parts[5])
-    temp_c = clean_num(parts[6])
-
-    flags = parts[7].strip()
-    # Strip any non 0/1 from flags too
-    flags = "".join(c for c in flags if c in "01")
-
-    if len(flags) != 8:
-        raise ValueError(
-            f"Flags field should be 8 bits, got: {flags!r} from {parts[7]!r}"
-        )
 
-    b7, b6, b5, b4, b3, b2, b1, b0 = flags
+    A clean line is parsed with a single Q1_RE match; only lines with
+    noise inside the fields go through the per-token clean_num() path.
+    """
+    m = Q1_RE.match(line)
+    if m is not None:
+        vin_s, vin_fault_s, vout_s, load_s, freq_s, batt_s, temp_s, flags = m.groups()
+        vin = float(vin_s)
+        vin_fault = float(vin_fault_s)
+        vout = float(vout_s)
+        load_pct = int(float(load_s))
+        freq = float(freq_s)
+        batt_v = float(batt_s)
+        temp_c = float(temp_s)
+    else:
+        parts = line.split()
+        if len(parts) < 8:
+            raise ValueError(f"Not enough fields in Megatec line: {parts!r}")
+
+        # Clean numeric tokens individually
+        vin = clean_num(parts[0])
+        vin_fault = clean_num(parts[1])
+        vout = clean_num(parts[2])
+        load_pct = int(clean_num(parts[3]))
+        freq = clean_num(parts[4])
+        batt_v = clean_num(parts[5])
+        temp_c = clean_num(parts[6])
+
+        flags = parts[7].strip()
+        # Strip any non 0/1 from flags too
+        flags = "".join(c for c in flags if c in "01")
+
+        if len(flags) != 8:
+            raise ValueError(
+                f"Flags field should be 8 bits, got: {flags!r} from {parts[7]!r}"
+            )
+
+    bits = int(flags, 2)  # b7 is the first character
 
     return {
         "input_voltage": vin,
@@ -119,36 +220,60 @@ def parse_megatec_q1(line: str):
         "battery_voltage": batt_v,
         "temperature_c": temp_c,
         "flags_raw": flags,
-        "on_battery": (b7 == "1"),
-        "battery_low": (b6 == "1"),
-        "avr_active": (b5 == "1"),
-        "ups_failed": (b4 == "1"),
-        "standby_type": (b3 == "1"),
-        "test_in_progress": (b2 == "1"),
-        "shutdown_active": (b1 == "1"),
-        "beeper_on": (b0 == "1"),
+        "on_battery": bool(bits & 0x80),
+        "battery_low": bool(bits & 0x40),
+        "avr_active": bool(bits & 0x20),
+        "ups_failed": bool(bits & 0x10),
+        "standby_type": bool(bits & 0x08),
+        "test_in_progress": bool(bits & 0x04),
+        "shutdown_active": bool(bits & 0x02),
+        "beeper_on": bool(bits & 0x01),
     }
 
 
 def maybe_shutdown() -> bool:
-    """Trigger system shutdown if enabled."""
+    """
+    Trigger system shutdown if enabled. Returns True only if logind
+    accepted the power-off (SHUTDOWN_CMD exited 0), so the caller retries
+    on the next poll otherwise (e.g. refused by polkit or an inhibitor).
+    """
     if not ENABLE_SHUTDOWN:
         print("[DRY RUN] Would shutdown now.")
         return False
 
     print(">>> Executing shutdown:", " ".join(SHUTDOWN_CMD))
     try:
-        subprocess.Popen(SHUTDOWN_CMD)
+        result = subprocess.run(
+            SHUTDOWN_CMD,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            timeout=SHUTDOWN_TIMEOUT,
+        )
     except Exception as e:
-        print("ERROR starting shutdown:", e)
-    finally:
-        return True
+        print("ERROR running shutdown:", e)
+        return False
+
+    if result.returncode != 0:
+        print(
+            f"ERROR: shutdown refused (rc={result.returncode}):",
+            result.stderr.decode("utf-8", errors="replace").strip(),
+        )
+        return False
+
+    return True
 
 
 def _get_io_endpoints(dev):
     """
     Locate the first BULK/INT IN and OUT endpoints on interface 0.
+    The result is cached on the device as dev._cached_ep_in and
+    dev._cached_ep_out.
     """
+    ep_in = getattr(dev, "_cached_ep_in", None)
+    ep_out = getattr(dev, "_cached_ep_out", None)
+    if ep_in is not None and ep_out is not None:
+        return ep_in, ep_out
+
     cfg = dev.get_active_configuration()
     intf = cfg[(0, 0)]
 
@@ -166,18 +291,22 @@ def _get_io_endpoints(dev):
     if ep_out is None or ep_in is None:
         raise RuntimeError("Could not find both IN and OUT endpoints for UPS.")
 
+    dev._cached_ep_in = ep_in
+    dev._cached_ep_out = ep_out
     return ep_in, ep_out
 
 
-def send_megatec_command(dev, cmd: str, read_reply: bool = False, maxlen: int = 64):
+def send_megatec_command(dev, cmd, read_reply: bool = False, maxlen: int = 64):
     """
-    Send a raw Megatec command (ASCII) over the UPS bulk OUT endpoint.
-    Optionally read a reply from the IN endpoint.
+    Send a raw Megatec command (ASCII str or bytes) over the UPS bulk OUT
+    endpoint. Optionally read a reply from the IN endpoint.
     """
     ep_in, ep_out = _get_io_endpoints(dev)
 
-    # Write the command bytes, e.g. "Q\r"
-    ep_out.write(cmd.encode("ascii"))
+    # Write the command bytes, e.g. b"Q\r"
+    if isinstance(cmd, str):
+        cmd = cmd.encode("ascii")
+    ep_out.write(cmd)
 
     if not read_reply:
         return None
@@ -190,11 +319,11 @@ def disable_beeper_if_needed(dev):
     """
     Ensure the UPS beeper is disabled.
 
-    - Reads a Q1 status line using the existing mechanism.
+    - Reads a Q1 status line (see read_q1_line()).
     - If 'beeper_on' is True, sends 'Q\\r' to toggle it off.
     """
     try:
-        line = megatec_q1_from_usb(dev)
+        line = read_q1_line(dev)
         status = parse_megatec_q1(line)
     except Exception as e:
         print("Could not read initial UPS status to check beeper:", e)
@@ -204,7 +333,7 @@ def disable_beeper_if_needed(dev):
         print("Beeper is currently ENABLED – sending toggle command to disable.")
         try:
             # Q<CR> toggles the beeper on Megatec devices
-            send_megatec_command(dev, "Q\r", read_reply=False)
+            send_megatec_command(dev, MEGATEC_BEEPER_CMD, read_reply=False)
         except Exception as e:
             print("ERROR sending beeper toggle command:", e)
     else:
@@ -217,10 +346,15 @@ def main():
 
     on_battery_since = None
     beeper_silenced_this_outage = False
+    last_status_key = None
+    poll_count = 0
 
     while True:
+        # Set when a command was just sent, to read the result straight away
+        repoll_now = False
+
         try:
-            line = megatec_q1_from_usb(dev)
+            line = read_q1_line(dev)
             status = parse_megatec_q1(line)
         except Exception as e:
             print("ERROR querying UPS:", e)
@@ -236,13 +370,22 @@ def main():
         load = status["load_percent"]
         beeper_on = status["beeper_on"]
 
-        print(
-            f"Vin={vin:.1f}V, Vout={vout:.1f}V, Load={load}%, "
-            f"Batt={batt_v:.2f}V, on_battery={on_batt}, "
-            f"battery_low={batt_low}, flags={status['flags_raw']}"
+        # Only print the status line when it changed or every Nth poll
+        status_key = (on_batt, batt_low, int(vin), int(batt_v * 10))
+        show_status = (
+            status_key != last_status_key or poll_count % STATUS_PRINT_EVERY == 0
         )
+        last_status_key = status_key
+        poll_count += 1
+
+        if show_status:
+            print(
+                f"Vin={vin:.1f}V, Vout={vout:.1f}V, Load={load}%, "
+                f"Batt={batt_v:.2f}V, on_battery={on_batt}, "
+                f"battery_low={batt_low}, flags={status['flags_raw']}"
+            )
 
-        now = time.time()
+        now = time.monotonic()
 
         if on_batt:
             if on_battery_since is None:
@@ -254,19 +397,22 @@ def main():
             if beeper_on and not beeper_silenced_this_outage:
                 print(">>> UPS beeper is ON – sending Q\\r to silence it.")
                 try:
-                    send_megatec_command(dev, "Q\r", read_reply=False)
+                    send_megatec_command(dev, MEGATEC_BEEPER_CMD, read_reply=False)
                     beeper_silenced_this_outage = True
+                    repoll_now = True
                 except Exception as e:
                     print("ERROR sending beeper toggle command:", e)
 
             elapsed = now - on_battery_since
-            print(f"On battery for {elapsed:.0f} seconds.")
+            if show_status:
+                print(f"On battery for {elapsed:.0f} seconds.")
 
             # Derived low-voltage condition
             soft_batt_low = batt_v <= LOW_BATT_VOLT
 
-            # Immediate shutdown if either the UPS says low
-            # or our own voltage threshold is reached
+            # Immediate shutdown if either the UPS says low or our own
+            # voltage threshold is reached; the grace period is a
+            # secondary safety
             if batt_low or soft_batt_low:
                 print(
                     ">>> Battery low condition – "
@@ -275,21 +421,7 @@ def main():
                 )
                 if maybe_shutdown():
                     break
-
-            # Grace-period shutdown as a secondary safety
-            if elapsed >= GRACE_ON_BATTERY:
-                print(">>> On battery longer than grace period – initiating shutdown.")
-                if maybe_shutdown():
-                    break
-
-            # Immediate shutdown if battery_low
-            if batt_low:
-                print(">>> Battery low flag set – initiating shutdown.")
-                if maybe_shutdown():
-                    break
-
-            # Grace-period shutdown
-            if elapsed >= GRACE_ON_BATTERY:
+            elif elapsed >= GRACE_ON_BATTERY:
                 print(">>> On battery longer than grace period – initiating shutdown.")
                 if maybe_shutdown():
                     break
@@ -301,7 +433,8 @@ def main():
                 on_battery_since = None
                 beeper_silenced_this_outage = False
 
-        time.sleep(POLL_INTERVAL)
+        if not repoll_now:
+            time.sleep(POLL_INTERVAL)
 
 
 if __name__ == "__main__":